@@ -0,0 +1,8 @@
+date_spine as (
+    -- one row per calendar day from the start of the lookback to end_date
+    select 
+        dateadd('day', spine.value::int, dateadd('day', -{lookback_days}, date('{start_date}'))) as date
+    from table(flatten(input => array_generate_range(
+        0, datediff('day', dateadd('day', -{lookback_days}, date('{start_date}')), date('{end_date}')) + 1
+    ))) as spine
+)
@@ -0,0 +1,91 @@
+"""
+Flags anomalies in every registry metric x every group, headlessly.
+
+Pulls every metric in the metric registry for every var to group by with one grouping sets query per source
+(through the same range cache / arrow store as the dashboard), stacks them into one (metric x group x date) array,
+z-scores each point against its trailing baseline and writes the ranked anomalies where the dashboard shows them
+(ANOMALY_TABLE_PATH). Run it from the dashboard's directory after the nightly dbt build (and warm_cache.py), ie.
+    python detect_anomalies.py --rolling-window 7 --min-abs-z 3
+"""
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta
+import coloredlogs
+from decouple import config, Csv
+from query_runners_cached import BUILD_LAG_DAYS, get_metrics_by_grouping_sets, get_settled_before
+from utils.anomalies import to_metric_cube, mask_unsettled_days, get_rolling_z_scores, rank_anomalies
+from utils.grouping_sets import VAR_TO_GROUP_BY_OPTIONS
+from utils.metric_registry import METRIC_REGISTRY
+from utils.rolling_windows import ROLLING_WINDOWS, select_rolling_window
+logger = logging.getLogger(__name__)
+coloredlogs.install(level=config('LOG_LEVEL', default='INFO'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--metrics', nargs='+', default=list(METRIC_REGISTRY), help='registry metrics to check')
+    parser.add_argument(
+        '--vars-to-group-by', nargs='+',
+        default=config('ANOMALY_VARS_TO_GROUP_BY', default=','.join(VAR_TO_GROUP_BY_OPTIONS), cast=Csv()),
+        help='dim_users columns to group by, all fetched in the same grouping sets scan'
+    )
+    parser.add_argument('--rolling-window', type=int, default=7, choices=ROLLING_WINDOWS, help='rolling window (last n days) of the metrics')
+    parser.add_argument(
+        '--days', type=int, default=None,
+        help="days of history to pull, defaults to just enough for the metrics' last settled days to get a z-score"
+    )
+    parser.add_argument('--baseline-days', type=int, default=56, help='trailing days each point is compared to')
+    parser.add_argument('--min-periods', type=int, default=28, help='days the baseline needs before a point gets a z-score')
+    parser.add_argument('--last-n-days', type=int, default=1, help="flag anomalies in each series' last n days with a z-score")
+    parser.add_argument('--min-abs-z', type=float, default=3.0, help='|z-score| to flag')
+    parser.add_argument('--output', default=config('ANOMALY_TABLE_PATH', default='anomalies.parquet'), help='parquet the dashboard reads')
+    args = parser.parse_args()
+
+    if args.days is None:
+        # the longest settling metric's last settled day is this many days back, and it needs a full baseline behind it
+        args.days = (
+            max(METRIC_REGISTRY[metric].settle_days for metric in args.metrics) + BUILD_LAG_DAYS
+            + args.last_n_days + args.rolling_window + args.baseline_days + args.min_periods
+        )
+    end_date = datetime.today().date() - timedelta(days=1)
+    metric_df = select_rolling_window(
+        get_metrics_by_grouping_sets(
+            start_date=end_date - timedelta(days=args.days),
+            end_date=end_date,
+            vars_to_group_by=tuple(args.vars_to_group_by),
+            metric_names=tuple(args.metrics)
+        ),
+        args.rolling_window
+    )
+    cube, groups, dates = to_metric_cube(metric_df, args.metrics)
+    # a window with unsettled cohorts is short some days (or still loading), only score full settled windows
+    cube = mask_unsettled_days(
+        cube, dates,
+        [get_settled_before(METRIC_REGISTRY[metric].settle_days) for metric in args.metrics]
+    )
+    logger.info(f'z-scoring {cube.shape[0]} metrics x {cube.shape[1]} groups x {cube.shape[2]} days')
+    z_scores, baseline_mean = get_rolling_z_scores(
+        cube,
+        baseline_days=args.baseline_days,
+        # keep the point's own rolling window out of its baseline
+        gap_days=args.rolling_window,
+        min_periods=args.min_periods
+    )
+    anomalies_df = rank_anomalies(
+        cube, z_scores, baseline_mean, args.metrics, groups, dates,
+        last_n_days=args.last_n_days,
+        min_abs_z=args.min_abs_z
+    )
+    anomalies_df['rolling_window'] = args.rolling_window
+    anomalies_df['detected_at'] = datetime.now()
+
+    # write next to the table and swap it in, so the dashboard never reads half a file
+    tmp_path = f'{args.output}.{os.getpid()}.tmp'
+    anomalies_df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, args.output)
+    logger.info(f'wrote {len(anomalies_df)} anomalies to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
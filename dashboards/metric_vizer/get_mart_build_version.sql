@@ -0,0 +1,6 @@
+-- the last time dbt (re)built a table in the marts schema, results fetched before it can be stale
+select 
+    max(last_altered) as last_altered
+from {DB_NAME}.information_schema.tables
+where true 
+    and table_schema = upper('{DB_SCHEMA}')
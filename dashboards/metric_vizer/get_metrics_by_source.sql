@@ -0,0 +1,74 @@
+with filtered_daily_totals as (
+    -- every requested metric of this source in one scan
+    select
+        date(src.{source_date_col}) as date,
+        du.{var_to_group_by},
+        {daily_totals}
+    from {DB_NAME}.{DB_SCHEMA}.{source_table} as src
+    join {DB_NAME}.{DB_SCHEMA}.dim_users as du on src.user_id = du.user_id
+    where true
+        -- only scan the dates the rolling window needs
+        and src.{source_date_col} >= dateadd('day', -{lookback_days}, date('{start_date}'))
+        and src.{source_date_col} < dateadd('day', 1, date('{end_date}'))
+        {filters}
+    group by 1,2
+)
+
+, {date_spine}
+
+, groups as (
+    select distinct {var_to_group_by} from filtered_daily_totals
+)
+
+, daily_totals_filled as (
+    -- add a zero row for every day x group so the windows see every calendar day
+    select
+        date,
+        {var_to_group_by},
+        {filled_totals}
+    from (
+        select
+            date,
+            {var_to_group_by},
+            {count_cols}
+        from filtered_daily_totals
+        union all
+        select
+            ds.date,
+            g.{var_to_group_by},
+            {zero_totals}
+        from date_spine as ds
+        cross join groups as g
+    )
+    group by 1,2
+)
+
+, cumulative_totals as (
+    -- one running total per group, every rolling window is a difference of two of these
+    select
+        date,
+        {var_to_group_by},
+        {cumulative_totals}
+    from daily_totals_filled
+)
+
+, last_n_days_totals as (
+    -- the spine is dense so lagging n rows is lagging n calendar days
+    select
+        date,
+        {var_to_group_by},
+        {last_n_days_totals}
+    from cumulative_totals
+)
+
+, rates as (
+    select
+        *,
+        {rates}
+    from last_n_days_totals
+    order by 1 desc
+)
+
+
+select * from rates
+where date between date('{start_date}') and date('{end_date}')
@@ -0,0 +1,7 @@
+-- one row per partition, the mirror refetches a partition when its row count or hash changes
+select 
+    date({partition_col}) as partition_date,
+    count(*) as count_rows,
+    hash_agg(*) as row_hash
+from {DB_NAME}.{DB_SCHEMA}.{table}
+group by 1
@@ -0,0 +1,4 @@
+select *
+from {DB_NAME}.{DB_SCHEMA}.{table}
+where false
+    {partition_filters}
@@ -0,0 +1,91 @@
+with filtered_users as (
+    select 
+        date(fpd.first_trial_at) as date,
+        {group_by_columns},
+        {user_counts}
+    from {DB_NAME}.{DB_SCHEMA}.fct_periodic_daily_user_trial_activation_metrics as fpd
+    join {DB_NAME}.{DB_SCHEMA}.dim_users as du on fpd.user_id = du.user_id
+    where true 
+        -- only scan the dates the rolling window needs
+        and fpd.first_trial_at >= dateadd('day', -{lookback_days}, date('{start_date}'))
+        and fpd.first_trial_at < dateadd('day', 1, date('{end_date}'))
+        {filters}
+)
+
+, filtered_daily_totals as (
+    -- one scan for every group by, stacked as (group_by, group_value) pairs
+    select 
+        date,
+        {group_by_label} as group_by,
+        {group_value} as group_value,
+        {filled_totals}
+    from filtered_users
+    group by grouping sets (
+        {grouping_sets}
+    )
+)
+
+, {date_spine}
+
+, groups as (
+    select distinct group_by, group_value from filtered_daily_totals
+)
+
+, daily_totals_filled as (
+    -- add a zero row for every day x group so the windows see every calendar day
+    select 
+        date,
+        group_by,
+        group_value,
+        {filled_totals}
+    from (
+        select 
+            date,
+            group_by,
+            group_value,
+            {count_cols}
+        from filtered_daily_totals
+        union all
+        select 
+            ds.date,
+            g.group_by,
+            g.group_value,
+            {zero_totals}
+        from date_spine as ds
+        cross join groups as g
+    )
+    group by 1,2,3
+)
+
+, cumulative_totals as (
+    -- one running total per group, every rolling window is a difference of two of these
+    select 
+        date,
+        group_by,
+        group_value,
+        {cumulative_totals}
+    from daily_totals_filled
+)
+
+, last_n_days_totals as (
+    -- the spine is dense so lagging n rows is lagging n calendar days (one per ROLLING_WINDOWS)
+    select 
+        date,
+        group_by,
+        group_value,
+        {last_n_days_totals}
+    from cumulative_totals
+)
+
+, rates as (
+    -- trial_to_customer_rate_30d_last_<n>d, null until the window's newest cohort is past the 30d cap
+    select 
+        *,
+        {rates}
+    from last_n_days_totals
+    order by 1 desc
+)
+
+
+select * from rates
+where date between date('{start_date}') and date('{end_date}')
\ No newline at end of file
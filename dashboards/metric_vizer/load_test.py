@@ -0,0 +1,239 @@
+"""
+Load test for the metric vizer dashboard.
+
+Runs the app headlessly (streamlit's AppTest) with N concurrent simulated analysts clicking through
+metric / group by / rolling window / filter / end date / compare metrics changes, against a stub warehouse instead of Snowflake,
+and reports page latency percentiles, cache hit rate, memory and warehouse queueing per concurrency level.
+
+Run it from the directory the dashboard runs from (so its relative sql paths resolve), ie.
+    python load_test.py --concurrency 1 4 16 --steps 20 --latency-seconds 1.5
+"""
+import argparse
+import logging
+import os
+import random
+import resource
+import threading
+import time
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import coloredlogs
+import snowflake.connector
+import streamlit as st
+from streamlit.runtime import Runtime
+from streamlit.testing.v1 import AppTest
+from utils.stub_warehouse import StubWarehouse
+logger = logging.getLogger(__name__)
+coloredlogs.install(level=os.environ.get('LOG_LEVEL', 'INFO'))
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '👾Metric_Vizer.py')
+
+# how often each kind of click happens in a session
+ACTIONS = {
+    'metric': 0.35,
+    'group_by': 0.3,
+    'rolling_window': 0.15,
+    'filter': 0.1,
+    'end_date': 0.05,
+    'compare': 0.05,
+}
+
+# the one multiselect that isn't a user filter
+COMPARE_METRICS_LABEL = 'Metrics to Compare'
+
+
+def share_app_test_runtime():
+    """
+    AppTest installs a mock Runtime for the length of each run and removes it when the run ends,
+    which pulls it out from under every other session running at the same time.
+    Keep serving the last mock Runtime instead (they're interchangeable).
+    """
+    last_runtime = []
+
+    def instance(cls):
+        if cls._instance is not None:
+            last_runtime[:] = [cls._instance]
+        if not last_runtime:
+            raise RuntimeError("Runtime hasn't been created!")
+        return last_runtime[0]
+
+    def exists(cls):
+        return cls._instance is not None or len(last_runtime) > 0
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+
+
+def get_widget(widgets, label):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f'no widget labelled {label}')
+
+
+def click(at: AppTest, action: str, rng: random.Random):
+    if action == 'metric':
+        widget = get_widget(at.selectbox, 'Metric 📈')
+        widget.select(rng.choice(widget.options))
+    elif action == 'group_by':
+        widget = get_widget(at.selectbox, 'Group By 🧨')
+        widget.select(rng.choice(widget.options))
+    elif action == 'rolling_window':
+        widget = get_widget(at.selectbox, 'Rolling Window (Last N Days)')
+        widget.select(int(rng.choice(widget.options)))
+    elif action == 'filter':
+        widget = rng.choice([widget for widget in at.multiselect if widget.label != COMPARE_METRICS_LABEL])
+        options = [option for option in widget.options if option != 'Select All']
+        if options and rng.random() < 0.7:
+            widget.set_value([rng.choice(options)])
+        else:
+            widget.set_value(['Select All'])
+    elif action == 'end_date':
+        widget = get_widget(at.date_input, 'End Date')
+        # a few days either way, never past yesterday
+        widget.set_value(min(
+            widget.value - timedelta(days=rng.randint(-3, 7)),
+            date.today() - timedelta(days=1)
+        ))
+    elif action == 'compare':
+        widget = get_widget(at.multiselect, COMPARE_METRICS_LABEL)
+        widget.set_value(rng.sample(list(widget.options), k=min(rng.randint(0, 2), len(widget.options))))
+    else:
+        raise NotImplementedError(f'action {action} not implemented yet')
+
+
+def get_load_test_session_id():
+    # the simulated session the current script run belongs to, set by run_session (None outside a script run)
+    try:
+        return st.session_state.get('load_test_session_id')
+    except Exception:
+        return None
+
+
+def get_rss_mb() -> float:
+    # current resident memory (linux), falls back to the peak
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (FileNotFoundError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_session(warehouse, session_id, n_steps, seed, timeout, page_views, lock):
+    rng = random.Random(f'{seed}-{session_id}')
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    # AppTest runs every session's script in its own thread under the same session id, tag the runs instead
+    at.session_state['load_test_session_id'] = session_id
+    for step in range(n_steps + 1):
+        action = 'load' if step == 0 else rng.choices(list(ACTIONS), weights=list(ACTIONS.values()))[0]
+        error = None
+        count_queries_before = warehouse.get_count_session_queries(session_id)
+        started_at = time.perf_counter()
+        try:
+            if action != 'load':
+                click(at, action, rng)
+            at.run()
+            if len(at.exception) > 0:
+                error = at.exception[0].message
+        except Exception as e:
+            error = repr(e)
+        with lock:
+            page_views.append(dict(
+                session_id=session_id,
+                step=step,
+                action=action,
+                seconds=time.perf_counter() - started_at,
+                warehouse_queries=warehouse.get_count_session_queries(session_id) - count_queries_before,
+                error=error,
+            ))
+
+
+def run_concurrency_level(warehouse, concurrency, n_steps, seed, timeout, keep_caches) -> dict:
+    if not keep_caches:
+        st.cache_data.clear()
+        st.cache_resource.clear()
+    warehouse.reset_stats()
+    page_views = []
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=run_session, args=(warehouse, session_id, n_steps, seed, timeout, page_views, lock))
+        for session_id in range(concurrency)
+    ]
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - started_at
+
+    page_views_df = pd.DataFrame(page_views)
+    ok_df = page_views_df[page_views_df['error'].isnull()]
+    errors_df = page_views_df[page_views_df['error'].notnull()]
+    for error, count in errors_df['error'].value_counts().head(3).items():
+        logger.warning(f'{count} page views failed with: {error}')
+    warehouse_stats = warehouse.get_stats()
+    return dict(
+        concurrency=concurrency,
+        page_views=len(page_views_df),
+        errors=len(errors_df),
+        p50_seconds=np.percentile(ok_df['seconds'], 50) if len(ok_df) else np.nan,
+        p95_seconds=np.percentile(ok_df['seconds'], 95) if len(ok_df) else np.nan,
+        p99_seconds=np.percentile(ok_df['seconds'], 99) if len(ok_df) else np.nan,
+        # a page view that didn't send the warehouse a single query was served from cache
+        cache_hit_rate=(ok_df['warehouse_queries'] == 0).mean() if len(ok_df) else np.nan,
+        page_views_per_second=len(page_views_df) / wall_seconds,
+        warehouse_queries=warehouse_stats['count_queries'],
+        max_queued_queries=warehouse_stats['max_queued'],
+        avg_queued_queries=warehouse_stats['avg_queued_at_submit'],
+        rss_mb=get_rss_mb(),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16], help='simultaneous sessions to run, one level after the other')
+    parser.add_argument('--steps', type=int, default=10, help='clicks per session after the first page load')
+    parser.add_argument('--latency-seconds', type=float, default=1.0, help='mean stub warehouse query latency')
+    parser.add_argument('--latency-jitter-seconds', type=float, default=0.25, help='std dev of the stub warehouse query latency')
+    parser.add_argument('--max-concurrent-queries', type=int, default=8, help='queries the stub warehouse runs at once, the rest queue')
+    parser.add_argument('--days', type=int, default=365, help='days of rows the stub returns when a query has no dates')
+    parser.add_argument('--groups', type=int, default=10, help='groups per group by the stub returns')
+    parser.add_argument('--timeout', type=float, default=120, help='seconds a page can take before counting as an error')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep-caches', action='store_true', help="don't clear the streamlit caches between levels")
+    parser.add_argument('--output', help='csv to write the results to')
+    args = parser.parse_args()
+
+    # the app reads these at import, the stub ignores them
+    for name, default in [('DB_USER', 'load_test'), ('DB_PASSWORD', 'load_test'), ('DB_ACCOUNT', 'load_test'), ('DB_NAME', 'load_test'), ('DB_SCHEMA', 'load_test'), ('LOG_LEVEL', 'WARNING')]:
+        os.environ.setdefault(name, default)
+    warehouse = StubWarehouse(
+        latency_seconds=args.latency_seconds,
+        latency_jitter_seconds=args.latency_jitter_seconds,
+        max_concurrent_queries=args.max_concurrent_queries,
+        n_days=args.days,
+        n_groups=args.groups,
+        seed=args.seed,
+        get_session_id=get_load_test_session_id,
+    )
+    snowflake.connector.connect = warehouse.connect
+    share_app_test_runtime()
+    import utils.helpers
+    utils.helpers.login = lambda: True
+
+    results = []
+    for concurrency in args.concurrency:
+        logger.info(f'running {concurrency} concurrent sessions x {args.steps} clicks')
+        results.append(run_concurrency_level(
+            warehouse, concurrency, args.steps, args.seed, args.timeout, args.keep_caches
+        ))
+        logger.info(results[-1])
+    results_df = pd.DataFrame(results)
+    print(results_df.round(3).to_string(index=False))
+    if args.output:
+        results_df.to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+import json
+import functools
+import logging
+from datetime import datetime, timedelta
+import pandas as pd
+import snowflake.connector
+import streamlit as st
+from decouple import config
+from utils.frames import compact_frame, freeze_frame
+from utils.rolling_windows import ROLLING_WINDOWS, get_rolling_window_parameters
+from utils.grouping_sets import get_grouping_sets_parameters
+from utils.metric_registry import METRIC_REGISTRY, plan_metric_queries, get_metric_query_parameters
+from utils.range_cache import DateRangeCache, get_canonical_filters, get_filters_key
+from utils.arrow_store import ArrowFrameStore
+import query_runners
+logger = logging.getLogger(__name__)
+
+# marks the log lines warm_cache.py reads the popular parameter sets from
+QUERY_RUNNER_LOG_MARKER = 'query_runner_call'
+
+ctx = snowflake.connector.connect(
+    user=config('DB_USER'),
+    password=config('DB_PASSWORD'),
+    account=config('DB_ACCOUNT'),
+    client_session_keep_alive=True
+)
+
+def list_to_str_for_sql(values):
+    return '(' + ', '.join("'" + str(value).replace("'", "''") + "'" for value in values) + ')'
+
+def get_filter_query_from_filter_dict(filters_dict, prefix='du'):
+    if len(filters_dict) == 0:
+        return 'and true'
+    else:
+        filter_query = ''
+        for filter_name in filters_dict:
+            filter_query += 'and '
+            filter_query += 'true \n' if 'Select All' in filters_dict[filter_name] else f"{prefix}.{filter_name} in " + list_to_str_for_sql(filters_dict[filter_name]) + '\n'
+        return filter_query
+
+# ctes shared across query templates, rendered with the same parameters as the template
+SHARED_QUERY_SNIPPETS = {
+    'date_spine': './sql/status/metric_vizer/date_spine.sql',
+}
+
+def get_query_from_template(filename:str, parameters:dict) -> str:
+    with open(filename, 'r') as f:
+        query = f.read()
+    snippets = {}
+    for snippet_name, snippet_filename in SHARED_QUERY_SNIPPETS.items():
+        if '{' + snippet_name + '}' in query:
+            with open(snippet_filename, 'r') as f:
+                snippets[snippet_name] = f.read().format(**parameters).strip()
+    return query.format(**parameters, **snippets)
+
+def get_results_from_query(filename:str, parameters:dict, logger, group_cols=()) -> pd.DataFrame:
+    query = get_query_from_template(filename, parameters)
+    logger.info(f'{filename} query: \n{query}')
+    df = pd.read_sql(query, ctx)
+    df.columns = [
+        col.lower()
+        for col in df.columns
+    ]
+    # compact + read-only so cache hits can share one copy across sessions
+    return freeze_frame(compact_frame(df, group_cols=group_cols))
+
+
+def log_query_runner_call(runner):
+    # logs every call's parameters (dates relative to today) so warm_cache.py can replay the popular ones
+    @functools.wraps(runner)
+    def wrapper(start_date, end_date, filters_dict={}, **parameters):
+        today = datetime.today().date()
+        logger.info(QUERY_RUNNER_LOG_MARKER + ' ' + json.dumps(dict(
+            runner=runner.__name__,
+            start_days_ago=(today - start_date).days,
+            end_days_ago=(today - end_date).days,
+            filters_dict=get_canonical_filters(filters_dict),
+            parameters=parameters,
+        ), default=list))
+        return runner(start_date=start_date, end_date=end_date, filters_dict=filters_dict, **parameters)
+    return wrapper
+
+@st.cache_resource()
+def get_arrow_frame_store():
+    # host-local store shared by every worker process, off unless ARROW_STORE_DIR is set
+    if not config('ARROW_STORE_DIR', default=''):
+        return None
+    return ArrowFrameStore(
+        config('ARROW_STORE_DIR'),
+        max_bytes=config('ARROW_STORE_MAX_BYTES', default=8 * 1024 ** 3, cast=int)
+    )
+
+@st.cache_resource()
+def get_query_range_cache():
+    # shared by every session in this process (and every worker on the host with an arrow store)
+    return DateRangeCache(
+        store=get_arrow_frame_store(),
+        max_age_seconds=config('RANGE_CACHE_MAX_AGE_SECONDS', default=7 * 24 * 60 * 60, cast=int)
+    )
+
+@st.cache_data(ttl=config('MART_BUILD_VERSION_TTL_SECONDS', default=300, cast=int), show_spinner=False)
+def get_mart_build_version() -> str:
+    # cached results are keyed on this, so a new dbt build shows up within the ttl
+    query = get_query_from_template(
+        './sql/status/metric_vizer/get_mart_build_version.sql',
+        dict(DB_NAME=config('DB_NAME'), DB_SCHEMA=config('DB_SCHEMA'))
+    )
+    return pd.Timestamp(pd.read_sql(query, ctx).iloc[0, 0]).isoformat()
+
+# days a trial cohort keeps converting for before its activation metrics stop changing
+TRIAL_ACTIVATION_SETTLE_DAYS = 30
+# the activation templates' counts and rates, every rolling window of them gets rendered from these
+TRIAL_ACTIVATION_COUNT_COLS = {
+    'count_trials_in_first_30d': 'fpd.count_trials_in_first_30d',
+    'count_customers_in_first_30d': 'fpd.count_customers_in_first_30d',
+}
+TRIAL_ACTIVATION_RATES = {
+    'trial_to_customer_rate_30d': ('count_customers_in_first_30d', 'count_trials_in_first_30d', TRIAL_ACTIVATION_SETTLE_DAYS),
+}
+# extra days before trusting a row as settled, the marts count against current_date() of their (nightly, sometimes late) build
+BUILD_LAG_DAYS = 1
+
+def get_settled_before(settle_days: int):
+    # rows dated before this were already past settle_days when the current marts were built
+    build_date = min(pd.Timestamp(get_mart_build_version()).date(), datetime.today().date())
+    return build_date - timedelta(days=settle_days + BUILD_LAG_DAYS)
+
+def get_query_parameters(start_date, end_date, filters_dict, **parameters) -> dict:
+    # the parameters every rolling window template takes, plus the template's own
+    return dict(
+        DB_NAME=config('DB_NAME'),
+        DB_SCHEMA=config('DB_SCHEMA'),
+        start_date=start_date, 
+        end_date=end_date, 
+        lookback_days=max(ROLLING_WINDOWS) - 1, # the window includes the current day
+        filters=get_filter_query_from_filter_dict(filters_dict),
+        **parameters
+    )
+
+def fetch_trial_activation_metrics_by_group(
+    start_date,
+    end_date,
+    var_to_group_by,
+    filters_dict={}
+):
+    parameters = get_query_parameters(
+        start_date, end_date, filters_dict,
+        var_to_group_by=var_to_group_by,
+        **get_rolling_window_parameters(TRIAL_ACTIVATION_COUNT_COLS, TRIAL_ACTIVATION_RATES, partition_by=var_to_group_by)
+    )
+    return get_results_from_query(
+        './sql/status/metric_vizer/get_trial_activation_metrics_by_group.sql',
+        parameters, logger,
+        group_cols=[var_to_group_by]
+    )
+
+@log_query_runner_call
+def get_trial_activation_metrics_by_group(
+    start_date,
+    end_date,
+    var_to_group_by,
+    filters_dict={}
+):
+    # returns every rolling window in ROLLING_WINDOWS, pick one with select_rolling_window
+    return get_query_range_cache().get(
+        key=('trial_activation', var_to_group_by, get_filters_key(filters_dict), tuple(ROLLING_WINDOWS)),
+        start_date=start_date,
+        end_date=end_date,
+        fetch=lambda fetch_start_date, fetch_end_date: fetch_trial_activation_metrics_by_group(
+            fetch_start_date, fetch_end_date, var_to_group_by, filters_dict
+        ),
+        settled_before=get_settled_before(TRIAL_ACTIVATION_SETTLE_DAYS),
+        version=get_mart_build_version()
+    )
+
+def fetch_trial_activation_metrics_by_grouping_sets(
+    start_date,
+    end_date,
+    vars_to_group_by,
+    filters_dict={}
+):
+    parameters = get_query_parameters(
+        start_date, end_date, filters_dict,
+        **get_grouping_sets_parameters(vars_to_group_by),
+        **get_rolling_window_parameters(TRIAL_ACTIVATION_COUNT_COLS, TRIAL_ACTIVATION_RATES, partition_by='group_by, group_value')
+    )
+    return get_results_from_query(
+        './sql/status/metric_vizer/get_trial_activation_metrics_by_grouping_sets.sql',
+        parameters, logger,
+        group_cols=['group_by', 'group_value']
+    )
+
+@log_query_runner_call
+def get_trial_activation_metrics_by_grouping_sets(
+    start_date,
+    end_date,
+    vars_to_group_by,
+    filters_dict={}
+):
+    # every var in vars_to_group_by stacked in one frame, pick one with slice_grouping_set
+    return get_query_range_cache().get(
+        key=('trial_activation_grouping_sets', tuple(vars_to_group_by), get_filters_key(filters_dict), tuple(ROLLING_WINDOWS)),
+        start_date=start_date,
+        end_date=end_date,
+        fetch=lambda fetch_start_date, fetch_end_date: fetch_trial_activation_metrics_by_grouping_sets(
+            fetch_start_date, fetch_end_date, vars_to_group_by, filters_dict
+        ),
+        settled_before=get_settled_before(TRIAL_ACTIVATION_SETTLE_DAYS),
+        version=get_mart_build_version()
+    )
+
+def get_range_cached_registry_metrics(
+    cache_name,
+    cache_key,
+    start_date,
+    end_date,
+    metric_names,
+    fetch_source,
+    merge_cols
+):
+    """
+    Any registry metrics in one frame: one range cached scan per source, fetch_source(start_date, end_date, source_name, metric_names),
+    merged on merge_cols (the date and group cols). cache_key: whatever else the scans depend on (ie. group by, filters)
+    """
+    metric_dfs = []
+    for source_name, metrics in plan_metric_queries(metric_names).items():
+        source_metric_names = tuple(metric.name for metric in metrics)
+        settle_days = max(metric.settle_days for metric in metrics)
+        metric_dfs.append(get_query_range_cache().get(
+            key=(cache_name, source_name, source_metric_names, *cache_key, tuple(ROLLING_WINDOWS)),
+            start_date=start_date,
+            end_date=end_date,
+            fetch=lambda fetch_start_date, fetch_end_date, source_name=source_name, source_metric_names=source_metric_names: fetch_source(
+                fetch_start_date, fetch_end_date, source_name, source_metric_names
+            ),
+            settled_before=get_settled_before(settle_days),
+            version=get_mart_build_version()
+        ))
+    metric_df = metric_dfs[0]
+    for source_metric_df in metric_dfs[1:]:
+        metric_df = metric_df.merge(source_metric_df, on=merge_cols, how='outer')
+    return metric_df
+
+def fetch_metrics_by_source(
+    start_date,
+    end_date,
+    source_name,
+    metric_names,
+    var_to_group_by,
+    filters_dict={}
+):
+    parameters = get_query_parameters(
+        start_date, end_date, filters_dict,
+        var_to_group_by=var_to_group_by,
+        **get_metric_query_parameters(
+            source_name,
+            [METRIC_REGISTRY[metric_name] for metric_name in metric_names],
+            partition_by=var_to_group_by
+        )
+    )
+    return get_results_from_query(
+        './sql/status/metric_vizer/get_metrics_by_source.sql',
+        parameters, logger,
+        group_cols=[var_to_group_by]
+    )
+
+@log_query_runner_call
+def get_metrics_by_group(
+    start_date,
+    end_date,
+    var_to_group_by,
+    metric_names,
+    filters_dict={}
+):
+    # any registry metrics in one frame, one scan per source. every rolling window, pick one with select_rolling_window
+    return get_range_cached_registry_metrics(
+        'metrics',
+        (var_to_group_by, get_filters_key(filters_dict)),
+        start_date,
+        end_date,
+        metric_names,
+        fetch_source=lambda fetch_start_date, fetch_end_date, source_name, source_metric_names: fetch_metrics_by_source(
+            fetch_start_date, fetch_end_date, source_name, source_metric_names, var_to_group_by, filters_dict
+        ),
+        merge_cols=['date', var_to_group_by]
+    )
+
+def fetch_metrics_by_source_grouping_sets(
+    start_date,
+    end_date,
+    source_name,
+    metric_names,
+    vars_to_group_by,
+    filters_dict={}
+):
+    parameters = get_query_parameters(
+        start_date, end_date, filters_dict,
+        **get_grouping_sets_parameters(vars_to_group_by),
+        **get_metric_query_parameters(
+            source_name,
+            [METRIC_REGISTRY[metric_name] for metric_name in metric_names],
+            partition_by='group_by, group_value'
+        )
+    )
+    return get_results_from_query(
+        './sql/status/metric_vizer/get_metrics_by_source_grouping_sets.sql',
+        parameters, logger,
+        group_cols=['group_by', 'group_value']
+    )
+
+@log_query_runner_call
+def get_metrics_by_grouping_sets(
+    start_date,
+    end_date,
+    vars_to_group_by,
+    metric_names,
+    filters_dict={}
+):
+    # any registry metrics x every var in vars_to_group_by in one frame, one scan per source
+    return get_range_cached_registry_metrics(
+        'metrics_grouping_sets',
+        (tuple(vars_to_group_by), get_filters_key(filters_dict)),
+        start_date,
+        end_date,
+        metric_names,
+        fetch_source=lambda fetch_start_date, fetch_end_date, source_name, source_metric_names: fetch_metrics_by_source_grouping_sets(
+            fetch_start_date, fetch_end_date, source_name, source_metric_names, vars_to_group_by, filters_dict
+        ),
+        merge_cols=['date', 'group_by', 'group_value']
+    )
+
+def memoize_in_arrow_frame_store(runner):
+    # keeps the runner's frames in the host-local arrow store (when there is one) until the next mart build
+    @functools.wraps(runner)
+    def wrapper(start_date, end_date, filters_dict={}, **parameters):
+        store = get_arrow_frame_store()
+        memoized_runner = runner if store is None else store.memoize(runner, get_version=get_mart_build_version)
+        # canonical filters, so the dashboard's calls and warm_cache.py's replays of them share one entry
+        return memoized_runner(start_date=start_date, end_date=end_date, filters_dict=get_canonical_filters(filters_dict), **parameters)
+    return wrapper
+
+# the retention / user metric frames are the largest, keep one copy per host instead of per worker
+get_retention_metric = log_query_runner_call(memoize_in_arrow_frame_store(query_runners.get_retention_metric))
+get_user_metrics_by_group = log_query_runner_call(memoize_in_arrow_frame_store(query_runners.get_user_metrics_by_group))
@@ -0,0 +1,112 @@
+"""
+Mirrors the metric marts into local date partitioned parquet, incrementally.
+
+For each table, one cheap summary query (row count + hash_agg per partition date) is compared to the mirror's manifest
+and only the partitions that changed since the last sync get fetched (in batches of contiguous date ranges),
+written atomically and recorded in the manifest. Partitions gone from the warehouse get deleted.
+Run it from the dashboard's directory after the nightly dbt build, ie.
+    python sync_parquet_mirror.py --mirror-dir /data/metric_vizer/mirror
+"""
+import argparse
+import logging
+import coloredlogs
+import pandas as pd
+from decouple import config, Csv
+from query_runners_cached import ctx, get_query_from_template
+from utils.parquet_mirror import NULL_PARTITION, ParquetMirror, get_partition_key, get_partition_spans
+logger = logging.getLogger(__name__)
+coloredlogs.install(level=config('LOG_LEVEL', default='INFO'))
+
+# table: the date column it's partitioned by
+DEFAULT_MIRROR_TABLES = {
+    'dim_users': 'first_trial_at',
+    'fct_periodic_daily_user_trial_activation_metrics': 'first_trial_at',
+    'fct_accumulating_user_activation_metrics': 'first_trial_at',
+    'fct_accumulating_user_activation_horizon_metrics': 'first_trial_at',
+    'fct_accumulating_user_retention_metrics': 'first_customer_at',
+}
+
+
+def read_sql(filename: str, parameters: dict) -> pd.DataFrame:
+    # raw results (no compacting), the mirror keeps the warehouse's types
+    query = get_query_from_template(filename, parameters)
+    logger.debug(f'{filename} query: \n{query}')
+    df = pd.read_sql(query, ctx)
+    df.columns = [col.lower() for col in df.columns]
+    return df
+
+
+def get_partition_filters(partition_col: str, partition_keys) -> str:
+    partition_filters = ''
+    for start_date, end_date in get_partition_spans(partition_keys):
+        partition_filters += (
+            f"or ({partition_col} >= date('{start_date}') "
+            f"and {partition_col} < dateadd('day', 1, date('{end_date}')))\n"
+        )
+    if NULL_PARTITION in partition_keys:
+        partition_filters += f'or {partition_col} is null\n'
+    return partition_filters
+
+
+def sync_table(mirror: ParquetMirror, table: str, partition_col: str, max_partitions_per_query: int) -> dict:
+    parameters = dict(
+        DB_NAME=config('DB_NAME'),
+        DB_SCHEMA=config('DB_SCHEMA'),
+        table=table,
+        partition_col=partition_col,
+    )
+    if mirror.get_manifest(table).get('partition_col') not in (None, partition_col):
+        # repartitioned, start over
+        mirror.delete_table(table)
+    summary_df = read_sql('./sql/status/metric_vizer/get_partition_summary.sql', parameters)
+    changed, removed = mirror.get_partition_changes(table, partition_col, summary_df)
+    logger.info(f'{table}: {len(changed)} of {len(summary_df)} partitions changed, {len(removed)} removed')
+
+    changed_keys = sorted(changed)
+    count_rows = 0
+    for i in range(0, len(changed_keys), max_partitions_per_query):
+        batch_keys = changed_keys[i:i + max_partitions_per_query]
+        df = read_sql(
+            './sql/status/metric_vizer/get_partitions.sql',
+            dict(**parameters, partition_filters=get_partition_filters(partition_col, batch_keys))
+        )
+        partition_keys = df[partition_col].map(get_partition_key)
+        for partition_key in batch_keys:
+            mirror.put_partition(table, partition_key, df[partition_keys == partition_key])
+        count_rows += len(df)
+        # record each batch as it lands, so an interrupted sync picks up where it stopped
+        mirror.update_manifest(table, partition_col, {key: changed[key] for key in batch_keys}, [])
+
+    for partition_key in removed:
+        mirror.delete_partition(table, partition_key)
+    mirror.update_manifest(table, partition_col, {}, removed)
+    return dict(
+        table=table,
+        partitions=len(summary_df),
+        changed_partitions=len(changed),
+        removed_partitions=len(removed),
+        fetched_rows=count_rows,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mirror-dir', default=config('PARQUET_MIRROR_DIR', default='mirror'), help='root directory of the mirror')
+    parser.add_argument(
+        '--tables', nargs='+',
+        default=config('PARQUET_MIRROR_TABLES', default=','.join(f'{table}:{col}' for table, col in DEFAULT_MIRROR_TABLES.items()), cast=Csv()),
+        help='tables to mirror as table:partition_date_col'
+    )
+    parser.add_argument('--max-partitions-per-query', type=int, default=31, help='changed partitions fetched per query (bounds memory on the first sync)')
+    args = parser.parse_args()
+
+    mirror = ParquetMirror(args.mirror_dir)
+    results = []
+    for table_spec in args.tables:
+        table, partition_col = table_spec.split(':')
+        results.append(sync_table(mirror, table, partition_col, args.max_partitions_per_query))
+    print(pd.DataFrame(results).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+
+def to_metric_cube(df: pd.DataFrame, metric_cols, group_cols=('group_by', 'group_value'), date_col='date'):
+    """
+    Pivots a long (date x group rows, one column per metric) frame into a dense float array
+    of shape (metric, group, date), missing days / groups -> nan.
+    Returns (cube, groups (a MultiIndex of group_cols), dates)
+    """
+    dates = pd.date_range(df[date_col].min(), df[date_col].max())
+    wide_df = (
+        df.set_index([*group_cols, date_col])[list(metric_cols)]
+        .astype(float)
+        .unstack(date_col)
+        .reindex(columns=pd.MultiIndex.from_product([list(metric_cols), dates]))
+    )
+    cube = wide_df.to_numpy(dtype=float, na_value=np.nan).reshape(len(wide_df), len(metric_cols), len(dates))
+    return cube.transpose(1, 0, 2), wide_df.index, dates
+
+
+def mask_unsettled_days(cube: np.ndarray, dates, settled_before) -> np.ndarray:
+    """
+    nan from each metric's settled_before date on (one date per metric, along the first axis),
+    so only rolling windows whose every cohort is past its time cap get scored or go into a baseline
+    """
+    is_unsettled = np.asarray(dates)[None, :] >= pd.to_datetime(list(settled_before)).to_numpy()[:, None]
+    return np.where(is_unsettled[:, None, :], np.nan, cube)
+
+
+def get_trailing_sums(values: np.ndarray, n: int) -> np.ndarray:
+    # sum of the n values up to and including each position along the last axis
+    sums = np.cumsum(values, axis=-1)
+    sums[..., n:] = sums[..., n:] - sums[..., :-n]
+    return sums
+
+
+def get_rolling_z_scores(cube: np.ndarray, baseline_days=56, gap_days=7, min_periods=28):
+    """
+    z-score of every point against a trailing baseline: the mean / std of the baseline_days
+    ending gap_days before it, along the last (date) axis of the whole cube at once.
+    The gap keeps a rolling window metric's own window out of its baseline (set it to the rolling window).
+    Returns (z_scores, baseline_mean), nan where the baseline has fewer than min_periods values or no spread
+    """
+    is_observed = ~np.isnan(cube)
+    values = np.where(is_observed, cube, 0.0)
+    counts = get_trailing_sums(is_observed.astype(float), baseline_days)
+    sums = get_trailing_sums(values, baseline_days)
+    squared_sums = get_trailing_sums(values ** 2, baseline_days)
+
+    # shift the baseline windows so the window for date t ends at t - gap_days - 1
+    shift = gap_days + 1
+    shifted = np.full((3, *cube.shape), np.nan)
+    shifted[..., shift:] = np.stack([counts, sums, squared_sums])[..., :-shift]
+    counts, sums, squared_sums = shifted
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        baseline_mean = sums / counts
+        baseline_var = (squared_sums - counts * baseline_mean ** 2) / (counts - 1)
+        baseline_std = np.sqrt(np.clip(baseline_var, 0, None))
+        z_scores = (cube - baseline_mean) / baseline_std
+    is_valid = (counts >= min_periods) & (baseline_std > 0)
+    return np.where(is_valid, z_scores, np.nan), np.where(is_valid, baseline_mean, np.nan)
+
+
+def rank_anomalies(cube, z_scores, baseline_mean, metric_cols, groups, dates, last_n_days=1, min_abs_z=3.0) -> pd.DataFrame:
+    """
+    Every metric x group whose |z| >= min_abs_z on one of its last_n_days with a z-score, largest first.
+    Counted from each series' own last z-score, since long time cap rates settle (stop being null) later than totals
+    """
+    has_z_score = ~np.isnan(z_scores)
+    last_date_idx = z_scores.shape[-1] - 1 - np.argmax(has_z_score[..., ::-1], axis=-1)
+    is_recent = np.arange(len(dates)) > (last_date_idx[..., None] - last_n_days)
+    is_anomaly = has_z_score & is_recent & (np.abs(np.nan_to_num(z_scores)) >= min_abs_z)
+    metric_idx, group_idx, date_idx = np.nonzero(is_anomaly)
+    anomalies_df = pd.DataFrame({
+        'metric': np.asarray(metric_cols)[metric_idx],
+        **{
+            name: np.asarray(groups.get_level_values(name))[group_idx]
+            for name in groups.names
+        },
+        'date': dates[date_idx],
+        'value': cube[metric_idx, group_idx, date_idx],
+        'baseline': baseline_mean[metric_idx, group_idx, date_idx],
+        'z_score': z_scores[metric_idx, group_idx, date_idx],
+    })
+    anomalies_df['abs_z_score'] = anomalies_df['z_score'].abs()
+    return (
+        anomalies_df.sort_values('abs_z_score', ascending=False)
+        .drop(columns=['abs_z_score'])
+        .reset_index(drop=True)
+    )
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+def get_store_key(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def frame_to_table(df: pd.DataFrame, metadata: dict = None) -> pa.Table:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # floats keep NaN instead of a validity bitmap so they map back to numpy without a copy
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        if isinstance(series.dtype, np.dtype) and series.dtype.kind == 'f':
+            table = table.set_column(i, str(col), pa.array(series.to_numpy(), from_pandas=False))
+    schema_metadata = dict(table.schema.metadata or {})
+    if metadata is not None:
+        schema_metadata[b'metric_vizer'] = json.dumps(metadata, default=str).encode()
+    return table.replace_schema_metadata(schema_metadata)
+
+
+class ArrowFrameStore:
+    """
+    Host-local store of frames as Arrow IPC files, shared by every worker process on the host.
+    Reads memory map the file, so the pages are shared between processes through the OS page cache
+    and primitive columns without nulls come back as zero-copy read-only numpy arrays.
+
+    Files are only ever replaced (os.replace) or unlinked, never rewritten in place,
+    so a frame a worker already has mapped stays valid after it is overwritten or evicted.
+    """
+
+    def __init__(self, root_dir: str, max_bytes: int = None):
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root_dir, f'{key}.arrow')
+
+    def get(self, key: str):
+        # returns (frame, metadata) or (None, None) when key isn't stored
+        path = self._path(key)
+        try:
+            source = pa.memory_map(path, 'r')
+        except FileNotFoundError:
+            return None, None
+        table = pa.ipc.open_file(source).read_all()
+        try:
+            os.utime(path) # mark as recently used for eviction
+        except FileNotFoundError:
+            pass
+        metadata = (table.schema.metadata or {}).get(b'metric_vizer')
+        df = table.to_pandas(split_blocks=True, self_destruct=False)
+        return df, (json.loads(metadata) if metadata is not None else None)
+
+    def put(self, key: str, df: pd.DataFrame, metadata: dict = None):
+        table = frame_to_table(df, metadata)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                with pa.ipc.new_file(f, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes)
+
+    def delete(self, key: str):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self, max_bytes: int):
+        # least recently used first, unlinking never invalidates a frame another process has mapped
+        files = []
+        for filename in os.listdir(self.root_dir):
+            if not filename.endswith('.arrow'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.root_dir, filename))
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, filename))
+        total_bytes = sum(size for _, size, _ in files)
+        for _, size, filename in sorted(files):
+            if total_bytes <= max_bytes:
+                break
+            try:
+                os.unlink(os.path.join(self.root_dir, filename))
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+    def memoize(self, func, get_version=None):
+        """
+        Caches a frame returning function in the store, keyed on its name, arguments and get_version()
+        (ie. the build of the tables it reads), so a new version is a cache miss and the old files age out through evict
+        """
+        def wrapper(*args, **kwargs):
+            version = get_version() if get_version is not None else None
+            key = get_store_key(func.__name__, version, args, kwargs)
+            df, _ = self.get(key)
+            if df is None:
+                df = func(*args, **kwargs)
+                self.put(key, df)
+            return df
+        wrapper.__name__ = func.__name__
+        return wrapper
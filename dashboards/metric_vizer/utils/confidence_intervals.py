@@ -0,0 +1,87 @@
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+
+
+def get_z_score(confidence: float = 0.95) -> float:
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def to_float_array(values) -> np.ndarray:
+    # nullable Int32 / float32 frame columns -> float64, missing -> nan
+    return np.asarray(values, dtype=float)
+
+
+def get_wilson_interval(rate, n, confidence: float = 0.95):
+    """
+    Wilson score interval of binomial rates (successes / n), elementwise over whole arrays
+    (ie. every date x group of a metric frame at once). Stays inside [0, 1] and behaves for small n / rates near 0 or 1,
+    where the normal approximation doesn't. Returns (lower, upper), nan where n is 0 or missing
+    """
+    rate = to_float_array(rate)
+    n = to_float_array(n)
+    n = np.where(n > 0, n, np.nan)
+    z = get_z_score(confidence)
+    z2_n = z ** 2 / n
+    center = (rate + z2_n / 2) / (1 + z2_n)
+    half_width = z * np.sqrt(rate * (1 - rate) / n + z2_n / (4 * n)) / (1 + z2_n)
+    return center - half_width, center + half_width
+
+
+def get_change_interval(rate_start, n_start, rate_end, n_end, confidence: float = 0.95) -> dict:
+    """
+    Delta method intervals of the change between two independent binomial rates, elementwise:
+    absolute change (end - start) and relative change (end / start - 1, through the log of the ratio
+    so the interval stays asymmetric and above -100%). A change is significant when its interval excludes 0
+    """
+    rate_start, rate_end = to_float_array(rate_start), to_float_array(rate_end)
+    n_start, n_end = to_float_array(n_start), to_float_array(n_end)
+    n_start = np.where(n_start > 0, n_start, np.nan)
+    n_end = np.where(n_end > 0, n_end, np.nan)
+    z = get_z_score(confidence)
+
+    absolute_change = rate_end - rate_start
+    absolute_se = np.sqrt(rate_start * (1 - rate_start) / n_start + rate_end * (1 - rate_end) / n_end)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # undefined (nan) when either rate is 0
+        log_ratio = np.log(rate_end / rate_start)
+        log_ratio_se = np.sqrt((1 - rate_start) / (rate_start * n_start) + (1 - rate_end) / (rate_end * n_end))
+        log_ratio_se = np.where(np.isfinite(log_ratio) & np.isfinite(log_ratio_se), log_ratio_se, np.nan)
+
+    absolute_change_lower = absolute_change - z * absolute_se
+    absolute_change_upper = absolute_change + z * absolute_se
+    return dict(
+        absolute_change_lower=absolute_change_lower,
+        absolute_change_upper=absolute_change_upper,
+        relative_change_lower=np.exp(log_ratio - z * log_ratio_se) - 1,
+        relative_change_upper=np.exp(log_ratio + z * log_ratio_se) - 1,
+        # nan bounds compare False, so a change without an interval is never flagged
+        is_significant=(absolute_change_lower > 0) | (absolute_change_upper < 0),
+    )
+
+
+def add_wilson_interval(
+    df: pd.DataFrame,
+    rate_col: str,
+    lower_col: str,
+    upper_col: str,
+    denominator_col: str = None,
+    numerator_col: str = None,
+    confidence: float = 0.95
+) -> pd.DataFrame:
+    """
+    Adds the Wilson interval of rate_col, from whichever count the query returned:
+    the denominator directly, or the numerator (denominator = numerator / rate, unknown when the rate is 0)
+    """
+    if denominator_col is not None:
+        n = to_float_array(df[denominator_col])
+    elif numerator_col is not None:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            n = to_float_array(df[numerator_col]) / to_float_array(df[rate_col])
+        n = np.where(np.isfinite(n), np.round(n), np.nan)
+    else:
+        raise ValueError('either denominator_col or numerator_col has to be set')
+    lower, upper = get_wilson_interval(df[rate_col], n, confidence=confidence)
+    # assign returns a new frame, cached frames are read-only
+    return df.assign(**{lower_col: lower, upper_col: upper})
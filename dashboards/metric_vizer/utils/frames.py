@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+INT32_MIN, INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+
+def is_date_col(col: str) -> bool:
+    return col == 'date' or col.endswith('_date') or col.endswith('_at')
+
+
+def is_count_col(col: str) -> bool:
+    # counts (and their running / windowed sums) are whole numbers, everything else numeric is a float (ie. rates)
+    return (
+        col.startswith(('count_', 'cumulative_', 'new_'))
+        or col.endswith(('_totals', '_numerator', '_denominator'))
+    )
+
+
+def is_numeric(series: pd.Series) -> bool:
+    # snowflake NUMBER columns can come back as Decimal objects
+    numbers = pd.to_numeric(series, errors='coerce')
+    return numbers.isnull().sum() == series.isnull().sum()
+
+
+def compact_frame(df: pd.DataFrame, group_cols=()) -> pd.DataFrame:
+    """
+    Normalizes query results into a compact schema:
+    group columns -> category, dates -> datetime64 (day precision),
+    counts -> nullable Int32/Int64, everything else numeric -> float32.
+    Picked from the column names, not the values, so every chunk of the same query
+    (ie. an all null or all 0 / 1 rate on unsettled days) gets the same dtypes and concats cleanly
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if col in group_cols:
+            columns[col] = series.astype('category')
+        elif is_date_col(col):
+            columns[col] = pd.to_datetime(series).dt.normalize()
+        elif not is_numeric(series):
+            # ie. a group column that wasn't passed in
+            columns[col] = series.astype('category')
+        else:
+            numbers = pd.to_numeric(series).astype(float)
+            if is_count_col(col):
+                in_int32_range = numbers.dropna().between(INT32_MIN, INT32_MAX).all()
+                columns[col] = numbers.round().astype('Int32' if in_int32_range else 'Int64')
+            else:
+                columns[col] = numbers.astype('float32')
+    return pd.DataFrame(columns, index=df.index)
+
+
+def freeze_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rebuilds df on top of read-only numpy arrays so a frame shared between
+    sessions (ie. through st.cache_resource) can't be mutated in place by one of them
+    """
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, np.dtype):
+            values = series.to_numpy(copy=True)
+            values.flags.writeable = False
+            columns[col] = values
+        else:
+            columns[col] = series
+    return pd.DataFrame(columns, index=df.index, copy=False)
@@ -0,0 +1,59 @@
+import pandas as pd
+
+# every dim_users column the dashboard (and detect_anomalies.py) can group by
+VAR_TO_GROUP_BY_OPTIONS = [
+    'all_users',
+    'niche',
+    'attribution',
+    'total_gmv_in_first_30d_binned',
+    'count_unique_store_visits_in_first_30d_binned',
+    'ideal_user_status',
+    'stan_goal_multiple_choice',
+    'country',
+    ...
+]
+
+# group bys fetched together in one grouping sets scan (all_users is the total)
+DEFAULT_GROUPING_SETS_VARS_TO_GROUP_BY = [
+    'all_users',
+    'niche',
+    'attribution',
+    'country',
+    'ideal_user_status',
+]
+
+
+def get_grouping_sets_parameters(vars_to_group_by, prefix='du') -> dict:
+    """
+    Renders the query fragments for a grouping sets template, one grouping set per var in vars_to_group_by.
+    Each row gets labelled with the var it was grouped by (group_by) and that var's value (group_value).
+    """
+    group_by_label = 'case\n'
+    group_value = 'case\n'
+    for var_to_group_by in vars_to_group_by:
+        group_by_label += f"            when grouping({var_to_group_by}) = 0 then '{var_to_group_by}'\n"
+        group_value += f"            when grouping({var_to_group_by}) = 0 then {var_to_group_by}::varchar\n"
+    group_by_label += '        end'
+    group_value += '        end'
+    return dict(
+        group_by_columns=',\n        '.join(
+            f'{prefix}.{var_to_group_by}' for var_to_group_by in vars_to_group_by
+        ),
+        grouping_sets=',\n        '.join(
+            f'(date, {var_to_group_by})' for var_to_group_by in vars_to_group_by
+        ),
+        group_by_label=group_by_label,
+        group_value=group_value,
+    )
+
+
+def slice_grouping_set(df: pd.DataFrame, var_to_group_by: str) -> pd.DataFrame:
+    """Pulls one group by out of a stacked grouping sets frame, shaped like the single group by queries"""
+    group_df = (
+        df[df['group_by'] == var_to_group_by]
+        .drop(columns=['group_by'])
+        .rename(columns={'group_value': var_to_group_by})
+    )
+    if isinstance(group_df[var_to_group_by].dtype, pd.CategoricalDtype):
+        group_df[var_to_group_by] = group_df[var_to_group_by].cat.remove_unused_categories()
+    return group_df
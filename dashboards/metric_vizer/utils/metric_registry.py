@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+from utils.rolling_windows import get_rolling_window_parameters
+
+
+@dataclass(frozen=True)
+class MetricSource:
+    name: str
+    table: str  # model name in DB_NAME.DB_SCHEMA, one row per user
+    date_col: str  # the cohort date the rolling windows are over
+
+
+@dataclass(frozen=True)
+class MetricDefinition:
+    """
+    A metric as sums over a source's rows: numerator / denominator are sql expressions of the source's columns
+    (booleans count as 0 / 1). aggregation 'rate' divides the window's numerator by its denominator, 'total' is the numerator.
+    settle_days: days a cohort keeps changing for (ie. the time cap), cached rows newer than that get refetched.
+    At least 1, a cohort's day is still filling up (late loads) until the build after it
+    """
+    name: str
+    source: str
+    numerator: str
+    denominator: str = None
+    aggregation: str = 'rate'
+    settle_days: int = 1
+
+
+METRIC_SOURCES = {
+    source.name: source for source in [
+        MetricSource('trial_activation', 'fct_accumulating_user_activation_horizon_metrics', 'first_trial_at'),
+        MetricSource('customer_activation', 'fct_accumulating_user_activation_horizon_metrics', 'first_customer_at'),
+        MetricSource('retention', 'fct_accumulating_user_retention_metrics', 'first_customer_at'),
+    ]
+}
+
+METRIC_REGISTRY = {
+    metric.name: metric for metric in [
+        MetricDefinition('new_trials', 'trial_activation', 'src.first_trial_at is not null', aggregation='total'),
+        MetricDefinition('new_customers', 'customer_activation', 'src.first_customer_at is not null', aggregation='total'),
+        *[
+            MetricDefinition(
+                f'trial_to_{activation}_rate_{n_days}d',
+                'trial_activation',
+                f'is_trial_to_{activation}_in_first_{n_days}d',
+                f'is_trial_to_{activation}_eligible_{n_days}d',
+                settle_days=n_days
+            )
+            for activation in ['customer', 'live']
+            for n_days in [1, 14, 30]
+        ],
+        *[
+            MetricDefinition(
+                f'customer_to_at_least_100_gmv_rate_in_{n_days}d',
+                'customer_activation',
+                f'is_customer_to_at_least_100_gmv_in_first_{n_days}d',
+                f'is_customer_to_at_least_100_gmv_eligible_{n_days}d',
+                settle_days=n_days
+            )
+            for n_days in [30, 60, 180]
+        ],
+        *[
+            MetricDefinition(
+                f'retention_{n_days}d',
+                'retention',
+                f'count_retained_customers_for_{n_days}d',
+                f'count_customers_{n_days}d_denominator',
+                settle_days=n_days
+            )
+            for n_days in [30, 60, 180, 360]
+        ],
+    ]
+}
+
+
+def plan_metric_queries(metric_names) -> dict:
+    """Groups the requested metrics by source, each source is one scan: {source name: (metric definitions, ...)}"""
+    plan = {}
+    for metric_name in dict.fromkeys(metric_names):
+        if metric_name not in METRIC_REGISTRY:
+            raise NotImplementedError(f'metric {metric_name} not in the metric registry yet')
+        metric = METRIC_REGISTRY[metric_name]
+        plan.setdefault(metric.source, ())
+        plan[metric.source] += (metric,)
+    return plan
+
+
+def get_count_cols(metric: MetricDefinition) -> dict:
+    # {alias: sql expression} of the sums a metric needs
+    count_cols = {f'{metric.name}_numerator': metric.numerator}
+    if metric.aggregation == 'rate':
+        count_cols[f'{metric.name}_denominator'] = metric.denominator
+    elif metric.aggregation != 'total':
+        raise NotImplementedError(f'aggregation {metric.aggregation} not implemented yet')
+    return count_cols
+
+
+def get_metric_query_parameters(source_name: str, metrics, partition_by: str) -> dict:
+    """
+    Renders the fragments of get_metrics_by_source.sql (or its grouping sets version) for every metric of one source,
+    with the windows partitioned by partition_by (ie. the var to group by, or `group_by, group_value`).
+    Returns every window in ROLLING_WINDOWS like the activation queries:
+    `<metric>_numerator_last_<n>d_totals` (and `_denominator_`) plus `<metric>_last_<n>d`
+    """
+    source = METRIC_SOURCES[source_name]
+    count_cols = {}
+    rates = {}
+    for metric in metrics:
+        if metric.source != source_name:
+            raise ValueError(f'metric {metric.name} is from {metric.source}, not {source_name}')
+        count_cols.update(get_count_cols(metric))
+        rates[metric.name] = (
+            f'{metric.name}_numerator',
+            f'{metric.name}_denominator' if metric.aggregation == 'rate' else None,
+            metric.settle_days
+        )
+    return dict(
+        source_table=source.table,
+        source_date_col=source.date_col,
+        **get_rolling_window_parameters(count_cols, rates, partition_by)
+    )
@@ -0,0 +1,103 @@
+import json
+import os
+import shutil
+from datetime import date, datetime
+import pandas as pd
+from utils.range_cache import merge_spans
+
+# partition key of rows whose partition date is null
+NULL_PARTITION = 'null'
+
+
+def get_partition_key(partition_date) -> str:
+    if partition_date is None or pd.isnull(partition_date):
+        return NULL_PARTITION
+    return pd.Timestamp(partition_date).date().isoformat()
+
+
+def get_partition_spans(partition_keys) -> list:
+    # contiguous changed days -> inclusive (start_date, end_date) spans, so a fetch can prune by range
+    return merge_spans([
+        (date.fromisoformat(key), date.fromisoformat(key))
+        for key in partition_keys
+        if key != NULL_PARTITION
+    ])
+
+
+class ParquetMirror:
+    """
+    A local copy of warehouse tables as date partitioned parquet (hive style, ie. `dim_users/partition_date=2024-01-31/`).
+    Each table keeps a manifest of every partition's row count and hash as of its last sync,
+    so the next sync only fetches the partitions whose summary changed.
+    Partition files and manifests are written to a temp file and swapped in, readers never see half a file.
+    """
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+
+    def get_table_dir(self, table: str) -> str:
+        return os.path.join(self.root_dir, table)
+
+    def get_partition_dir(self, table: str, partition_key: str) -> str:
+        # the partition col stays in the files at full precision (ie. timestamps), the directory only has its date
+        return os.path.join(self.get_table_dir(table), f'partition_date={partition_key}')
+
+    def delete_table(self, table: str):
+        shutil.rmtree(self.get_table_dir(table), ignore_errors=True)
+
+    def get_manifest(self, table: str) -> dict:
+        try:
+            with open(os.path.join(self.get_table_dir(table), '_manifest.json'), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return dict(partitions={})
+
+    def put_manifest(self, table: str, manifest: dict):
+        path = os.path.join(self.get_table_dir(table), '_manifest.json')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def get_partition_changes(self, table: str, partition_col: str, summary_df: pd.DataFrame):
+        """
+        Compares the warehouse's partition summary (partition_date, count_rows, row_hash) to the manifest.
+        Returns (changed partitions: {key: summary}, removed partition keys)
+        """
+        manifest = self.get_manifest(table)
+        synced_partitions = manifest['partitions'] if manifest.get('partition_col') == partition_col else {}
+        partitions = {
+            get_partition_key(row.partition_date): dict(count_rows=int(row.count_rows), row_hash=str(row.row_hash))
+            for row in summary_df.itertuples(index=False)
+        }
+        changed = {
+            key: summary for key, summary in partitions.items()
+            if synced_partitions.get(key) != summary
+        }
+        removed = [key for key in synced_partitions if key not in partitions]
+        return changed, removed
+
+    def put_partition(self, table: str, partition_key: str, df: pd.DataFrame):
+        partition_dir = self.get_partition_dir(table, partition_key)
+        os.makedirs(partition_dir, exist_ok=True)
+        path = os.path.join(partition_dir, 'part.parquet')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def delete_partition(self, table: str, partition_key: str):
+        shutil.rmtree(self.get_partition_dir(table, partition_key), ignore_errors=True)
+
+    def update_manifest(self, table: str, partition_col: str, changed: dict, removed: list):
+        manifest = self.get_manifest(table)
+        partitions = manifest['partitions'] if manifest.get('partition_col') == partition_col else {}
+        partitions.update(changed)
+        for key in removed:
+            partitions.pop(key, None)
+        self.put_manifest(table, dict(
+            partition_col=partition_col,
+            synced_at=datetime.now().isoformat(timespec='seconds'),
+            partitions=partitions,
+        ))
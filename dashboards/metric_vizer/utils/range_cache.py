@@ -0,0 +1,210 @@
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+import pandas as pd
+from utils.arrow_store import get_store_key
+
+
+def get_canonical_filters(filters_dict: dict) -> dict:
+    # 'Select All' filters don't filter anything, and the order of filters / options doesn't change the query
+    return {
+        filter_name: sorted(map(str, options))
+        for filter_name, options in sorted(filters_dict.items())
+        if 'Select All' not in options
+    }
+
+
+def get_filters_key(filters_dict: dict) -> tuple:
+    return tuple(
+        (filter_name, tuple(options))
+        for filter_name, options in get_canonical_filters(filters_dict).items()
+    )
+
+
+def merge_spans(spans: list) -> list:
+    # spans are inclusive (start_date, end_date) pairs, touching spans get merged
+    merged = []
+    for start_date, end_date in sorted(spans):
+        if merged and start_date <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end_date))
+        else:
+            merged.append((start_date, end_date))
+    return merged
+
+
+def get_missing_spans(spans: list, start_date, end_date) -> list:
+    missing = []
+    cursor = start_date
+    for span_start, span_end in merge_spans(spans):
+        if span_end < cursor:
+            continue
+        if span_start > end_date:
+            break
+        if span_start > cursor:
+            missing.append((cursor, span_start - timedelta(days=1)))
+        cursor = span_end + timedelta(days=1)
+    if cursor <= end_date:
+        missing.append((cursor, end_date))
+    return missing
+
+
+def split_spans(spans: list, split_date) -> tuple:
+    # inclusive spans -> (the parts before split_date, the parts on or after it)
+    before, after = [], []
+    for span_start, span_end in spans:
+        if split_date is None or span_end < split_date:
+            before.append((span_start, span_end))
+        elif span_start >= split_date:
+            after.append((span_start, span_end))
+        else:
+            before.append((span_start, split_date - timedelta(days=1)))
+            after.append((split_date, span_end))
+    return before, after
+
+
+def concat_frames(frames: list) -> pd.DataFrame:
+    # concat turns categoricals with different categories into objects, so recategorize them
+    category_cols = [
+        col for col, dtype in frames[0].dtypes.items()
+        if isinstance(dtype, pd.CategoricalDtype)
+    ]
+    df = pd.concat(frames, ignore_index=True)
+    for col in category_cols:
+        df[col] = df[col].astype('category')
+    return df
+
+
+class DateRangeCache:
+    """
+    Caches daily rows per key (ie. metric family, group by, filters, windows)
+    and only fetches the date spans of a request that aren't cached yet.
+
+    fetch(start_date, end_date) has to return the final rows for every date in the span,
+    the query is responsible for its own rolling window lookback.
+    Each key keeps two entries:
+    - settled rows (dates before settled_before, ie. cohorts past their activation cap), which don't change between
+      mart builds and are kept for max_age_seconds (a backstop for backfills / model changes)
+    - every row served for the key at one version (ie. the build it was fetched from, or the day it was fetched on
+      without one), settled rows copied over from the first entry plus the unsettled tail fetched at that version
+    so repeated requests between two builds never query, and a new build only refetches the tail.
+
+    Entries are sorted by date when they're written, and only rewritten when their spans grow.
+    A cache hit is a positional slice of the stored frame (or the frame itself), never a copy,
+    so hits share the stored (with a store, memory-mapped) buffers.
+
+    With a store (utils.arrow_store.ArrowFrameStore) the rows and their spans live in the store
+    instead of this process, so every worker on the host shares them.
+    """
+
+    def __init__(self, date_col='date', max_keys=128, store=None, max_age_seconds=7 * 24 * 60 * 60):
+        self.date_col = date_col
+        self.max_keys = max_keys
+        self.store = store
+        self.max_age_seconds = max_age_seconds
+        self._entries = OrderedDict() # key -> (frame, cached spans, metadata)
+        self._lock = threading.Lock()
+
+    def _load(self, key):
+        if self.store is None:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                frame, spans, metadata = self._entries.get(key, (None, [], {}))
+        else:
+            frame, metadata = self.store.get(get_store_key(key))
+            if frame is None:
+                return None, [], {}
+            spans = [
+                (date.fromisoformat(span_start), date.fromisoformat(span_end))
+                for span_start, span_end in metadata.pop('spans')
+            ]
+        if self._is_expired(metadata):
+            return None, [], {}
+        return frame, spans, metadata
+
+    def _save(self, key, frame, spans, metadata):
+        if self.store is not None:
+            self.store.put(get_store_key(key), frame, metadata={
+                **metadata,
+                'spans': [[span_start.isoformat(), span_end.isoformat()] for span_start, span_end in spans],
+            })
+            return
+        with self._lock:
+            self._entries[key] = (frame, spans, metadata)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+
+    def _is_expired(self, metadata) -> bool:
+        if self.max_age_seconds is None or 'created_at' not in metadata:
+            return False
+        age = datetime.now() - datetime.fromisoformat(metadata['created_at'])
+        return age.total_seconds() > self.max_age_seconds
+
+    def _append(self, key, frame, spans, metadata, new_frames, new_spans):
+        frame = concat_frames(([] if frame is None else [frame]) + new_frames)
+        frame = frame.sort_values(self.date_col, ignore_index=True, kind='stable')
+        spans = merge_spans(spans + new_spans)
+        metadata = {'created_at': datetime.now().isoformat(), **metadata}
+        self._save(key, frame, spans, metadata)
+        return frame
+
+    def _slice(self, frame, start_date, end_date) -> pd.DataFrame:
+        # frame is sorted by date, so the range is one positional slice
+        dates = frame[self.date_col]
+        start = dates.searchsorted(pd.Timestamp(start_date), side='left')
+        end = dates.searchsorted(pd.Timestamp(end_date), side='right')
+        if start == 0 and end == len(frame):
+            return frame
+        return frame.iloc[start:end].reset_index(drop=True)
+
+    def _select_spans(self, frame, spans) -> pd.DataFrame:
+        return concat_frames([self._slice(frame, span_start, span_end) for span_start, span_end in spans])
+
+    def get(self, key, start_date, end_date, fetch, settled_before=None, version=None) -> pd.DataFrame:
+        version_key = (key, 'version', version if version is not None else date.today().isoformat())
+        frame, spans, metadata = self._load(version_key)
+        missing_spans = get_missing_spans(spans, start_date, end_date)
+
+        if missing_spans:
+            settled_frame, settled_spans, settled_metadata = self._load(key)
+            # the missing spans' settled rows another version already fetched
+            cached_spans = [
+                (max(span_start, missing_start), min(span_end, missing_end))
+                for missing_start, missing_end in missing_spans
+                for span_start, span_end in settled_spans
+                if span_start <= missing_end and span_end >= missing_start
+            ]
+            fetch_spans = [
+                span
+                for missing_start, missing_end in missing_spans
+                for span in get_missing_spans(settled_spans, missing_start, missing_end)
+            ]
+            new_frames = [self._select_spans(settled_frame, cached_spans)] if cached_spans else []
+            if fetch_spans:
+                fetched_frame = concat_frames([
+                    fetch(span_start, span_end)
+                    for span_start, span_end in fetch_spans
+                ])
+                new_frames.append(fetched_frame)
+                fetched_settled_spans, _ = split_spans(fetch_spans, settled_before)
+                if fetched_settled_spans:
+                    is_settled = (
+                        fetched_frame[self.date_col] < pd.Timestamp(settled_before)
+                        if settled_before is not None else
+                        pd.Series(True, index=fetched_frame.index)
+                    )
+                    self._append(
+                        key, settled_frame, settled_spans, settled_metadata,
+                        [fetched_frame[is_settled]], fetched_settled_spans
+                    )
+            frame = self._append(version_key, frame, spans, metadata, new_frames, missing_spans)
+
+        if frame is None:
+            # an empty range, nothing to cache
+            return fetch(start_date, end_date)
+        return self._slice(frame, start_date, end_date)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,85 @@
+import pandas as pd
+
+# every window the multi-window queries return, widest first (the sidebar default)
+ROLLING_WINDOWS = [30, 7, 1]
+
+# default start date (days before today) of the charts for each window
+DAYS_BACK_BY_ROLLING_WINDOW = {
+    30: 361, #+ 90
+    7: 91,
+    1: 31,
+}
+
+
+def select_rolling_window(df: pd.DataFrame, total_metrics_by_last_n_days: int) -> pd.DataFrame:
+    """
+    Picks one window out of a frame holding every window's columns
+    (ie. `*_last_7d_totals` and `*_last_7d`) and names them like the single window queries did
+    (ie. `*_last_n_days_totals` and the bare metric name)
+    """
+    suffix = f'_last_{total_metrics_by_last_n_days}d'
+    other_suffixes = tuple(
+        f'_last_{n_days}d'
+        for n_days in ROLLING_WINDOWS
+        if n_days != total_metrics_by_last_n_days
+    )
+    columns = {}
+    for col in df.columns:
+        if col.endswith(suffix + '_totals'):
+            columns[col] = col[:-len(suffix + '_totals')] + '_last_n_days_totals'
+        elif col.endswith(suffix):
+            columns[col] = col[:-len(suffix)]
+        elif col.endswith(other_suffixes) or col.endswith(tuple(s + '_totals' for s in other_suffixes)):
+            continue
+        else:
+            columns[col] = col
+    return df[list(columns)].rename(columns=columns)
+
+
+def get_rolling_window_parameters(count_cols: dict, rates: dict, partition_by: str) -> dict:
+    """
+    Renders the rolling window stages shared by the activation and metric registry templates,
+    with the windows partitioned by partition_by (ie. the var to group by, or `group_by, group_value`).
+    count_cols: {alias: sql expression per row}, summed per day
+    rates: {name: (numerator alias, denominator alias, settle_days)}, a None denominator is a plain total
+    Returns every window in ROLLING_WINDOWS: `<count col>_last_<n>d_totals` plus `<rate>_last_<n>d`
+    """
+    last_n_days_totals = []
+    rate_cols = []
+    for n_days in ROLLING_WINDOWS:
+        for col in count_cols:
+            last_n_days_totals.append(
+                f'cumulative_{col} - coalesce(lag(cumulative_{col}, {n_days}) over (\n'
+                f'            partition by {partition_by}\n'
+                f'            order by date\n'
+                f'        ), 0) as {col}_last_{n_days}d_totals'
+            )
+        for name, (numerator, denominator, settle_days) in rates.items():
+            numerator = f'{numerator}_last_{n_days}d_totals'
+            if denominator is None:
+                rate_cols.append(f'{numerator} as {name}_last_{n_days}d')
+                continue
+            denominator = f'{denominator}_last_{n_days}d_totals'
+            # null until the window's newest cohort is past the time cap, so every window is a full n days
+            rate_cols.append(
+                f"case when datediff('day', date, current_date()) > {settle_days} "
+                f'then {numerator} / nullif({denominator}, 0) end as {name}_last_{n_days}d'
+            )
+
+    return dict(
+        daily_totals=',\n        '.join(f'sum(({expression})::int) as {col}' for col, expression in count_cols.items()),
+        user_counts=',\n        '.join(f'({expression})::int as {col}' for col, expression in count_cols.items()),
+        zero_totals=',\n            '.join(f'0 as {col}' for col in count_cols),
+        count_cols=',\n            '.join(count_cols),
+        filled_totals=',\n        '.join(f'sum({col}) as {col}' for col in count_cols),
+        cumulative_totals=',\n        '.join(
+            f'sum({col}) over (\n'
+            f'            partition by {partition_by}\n'
+            f'            order by date\n'
+            f'            rows between unbounded preceding and current row\n'
+            f'        ) as cumulative_{col}'
+            for col in count_cols
+        ),
+        last_n_days_totals=',\n        '.join(last_n_days_totals),
+        rates=',\n        '.join(rate_cols),
+    )
@@ -0,0 +1,195 @@
+import re
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+# `... as alias` that isn't a cte (`name as (`)
+ALIAS_REGEX = re.compile(r'\bas\s+([a-z_][a-z0-9_]*)\b(?!\s*\()', re.IGNORECASE)
+QUALIFIED_COLUMN_REGEX = re.compile(r'\b([a-z_][a-z0-9_]*)\.([a-z_][a-z0-9_]*)\b', re.IGNORECASE)
+DATE_LITERAL_REGEX = re.compile(r"date\('(\d{4}-\d{2}-\d{2})'\)", re.IGNORECASE)
+GROUPING_REGEX = re.compile(r'\bgrouping\(([a-z_][a-z0-9_]*)\)', re.IGNORECASE)
+
+
+def get_columns_from_query(query: str) -> list:
+    """
+    Best guess at a query's output columns: every column alias plus every column selected through a table alias
+    (ie. `du.niche`). A superset is fine, the dashboard only picks the columns it needs.
+    """
+    qualified_columns = QUALIFIED_COLUMN_REGEX.findall(query)
+    table_aliases = {table_alias.lower() for table_alias, _ in qualified_columns}
+    columns = []
+    for col in ALIAS_REGEX.findall(query) + [col for _, col in qualified_columns]:
+        col = col.lower()
+        if col not in table_aliases and col not in columns:
+            columns.append(col)
+    return columns
+
+
+class StubCursor:
+    # just enough of a DB-API cursor for pd.read_sql
+
+    def __init__(self, warehouse):
+        self.warehouse = warehouse
+        self.description = None
+        self._rows = []
+
+    def execute(self, query, *args):
+        df = self.warehouse.execute(query)
+        self.description = [(col, None, None, None, None, None, None) for col in df.columns]
+        self._rows = list(df.itertuples(index=False, name=None))
+        return self
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+class StubConnection:
+
+    def __init__(self, warehouse):
+        self.warehouse = warehouse
+
+    def cursor(self):
+        return StubCursor(self.warehouse)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class StubWarehouse:
+    """
+    Stands in for snowflake.connector in load tests (swap `snowflake.connector.connect` for `connect`).
+    Every query waits for one of max_concurrent_queries slots (like a warehouse's queue),
+    sleeps latency_seconds +- latency_jitter_seconds (never less than min_latency_seconds) and returns synthetic rows:
+    one per day x group for the dates in the query, with columns guessed from the query text.
+    Queries are counted per get_session_id() (ie. per simulated user), so a caller can tell which page views queried.
+    """
+
+    def __init__(
+        self,
+        latency_seconds=1.0,
+        latency_jitter_seconds=0.25,
+        max_concurrent_queries=8,
+        n_days=365,
+        n_groups=10,
+        seed=0,
+        get_session_id=threading.get_ident
+    ):
+        self.latency_seconds = latency_seconds
+        self.latency_jitter_seconds = latency_jitter_seconds
+        self.max_concurrent_queries = max_concurrent_queries
+        self.n_days = n_days
+        self.n_groups = n_groups
+        self.seed = seed
+        self.get_session_id = get_session_id
+        self._slots = threading.BoundedSemaphore(max_concurrent_queries)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def min_latency_seconds(self) -> float:
+        return max(self.latency_seconds - 2 * self.latency_jitter_seconds, 0.0)
+
+    def connect(self, **kwargs) -> StubConnection:
+        return StubConnection(self)
+
+    def reset_stats(self):
+        with self._lock:
+            self.count_queries = 0
+            self.count_queued = 0
+            self.max_queued = 0
+            self.queued_at_submit = []
+            self.query_seconds = []
+            self.count_queries_by_session = Counter()
+
+    def get_count_session_queries(self, session_id) -> int:
+        with self._lock:
+            return self.count_queries_by_session[session_id]
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(
+                count_queries=self.count_queries,
+                max_queued=self.max_queued,
+                avg_queued_at_submit=float(np.mean(self.queued_at_submit)) if self.queued_at_submit else 0.0,
+                avg_query_seconds=float(np.mean(self.query_seconds)) if self.query_seconds else 0.0,
+            )
+
+    def execute(self, query: str) -> pd.DataFrame:
+        started_at = time.perf_counter()
+        session_id = self.get_session_id()
+        with self._lock:
+            self.count_queries += 1
+            self.count_queries_by_session[session_id] += 1
+            self.queued_at_submit.append(self.count_queued)
+            rng = np.random.default_rng([self.seed, self.count_queries])
+        if not self._slots.acquire(blocking=False):
+            # every slot is busy, wait in the queue
+            with self._lock:
+                self.count_queued += 1
+                self.max_queued = max(self.max_queued, self.count_queued)
+            self._slots.acquire()
+            with self._lock:
+                self.count_queued -= 1
+        try:
+            time.sleep(max(self.min_latency_seconds, rng.normal(self.latency_seconds, self.latency_jitter_seconds)))
+            df = self.get_results(query, rng)
+        finally:
+            self._slots.release()
+        with self._lock:
+            self.query_seconds.append(time.perf_counter() - started_at)
+        return df
+
+    def get_results(self, query: str, rng) -> pd.DataFrame:
+        if 'information_schema' in query.lower():
+            # the marts were built once, early today
+            return pd.DataFrame({'last_altered': [pd.Timestamp(date.today()) + pd.Timedelta(hours=3)]})
+        columns = get_columns_from_query(query)
+        # columns selected off a table alias (ie. du.niche) are dimensions
+        dimension_cols = {col.lower() for _, col in QUALIFIED_COLUMN_REGEX.findall(query)}
+        date_literals = sorted(date.fromisoformat(d) for d in DATE_LITERAL_REGEX.findall(query))
+        if date_literals:
+            start_date, end_date = date_literals[0], date_literals[-1]
+        else:
+            end_date = date.today() - timedelta(days=1)
+            start_date = end_date - timedelta(days=self.n_days - 1)
+        dates = pd.date_range(start_date, end_date)
+        if 'group_by' in columns:
+            # grouping sets queries stack every group by
+            vars_to_group_by = list(dict.fromkeys(var.lower() for var in GROUPING_REGEX.findall(query)))
+            columns = [col for col in columns if col not in vars_to_group_by]
+            group_by = np.repeat(vars_to_group_by, self.n_groups)
+            group_value = np.tile([f'group_{i}' for i in range(self.n_groups)], len(vars_to_group_by))
+        else:
+            group_by = group_value = np.arange(self.n_groups)
+        n_rows = len(dates) * len(group_value)
+
+        df = pd.DataFrame(index=range(n_rows))
+        for col in columns:
+            if col == 'date' or col.endswith('_at'):
+                df[col] = np.repeat(dates.date, len(group_value))
+            elif col == 'group_by':
+                df[col] = np.tile(group_by, len(dates))
+            elif col == 'group_value':
+                df[col] = np.tile(group_value, len(dates))
+            elif col.startswith(('count_', 'cumulative_', 'new_')):
+                df[col] = rng.poisson(100, n_rows)
+            elif 'rate' in col or col.startswith('retention'):
+                df[col] = rng.uniform(0, 1, n_rows)
+            elif col in dimension_cols:
+                df[col] = np.resize([f'{col}_{i}' for i in range(self.n_groups)], n_rows)
+            else:
+                df[col] = rng.uniform(0, 100, n_rows)
+        return df
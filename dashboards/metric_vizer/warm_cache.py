@@ -0,0 +1,94 @@
+"""
+Warms the dashboard's shared result cache after the nightly dbt build.
+
+Reads the query runner calls the dashboard logged (see query_runners_cached.log_query_runner_call),
+counts the parameter sets (runner, group by, filters, date range relative to the day they were logged),
+and runs the top K of them with bounded concurrency so the morning's common views load from warm cache.
+
+The cache has to be the host-local arrow store (ARROW_STORE_DIR), the one every dashboard worker reads from.
+Entries are keyed on the mart build, so the warmed ones are full cache hits until the next build and the old build's age out.
+Chain it after the dbt run, ie.
+    dbt build && python warm_cache.py /var/log/metric_vizer/*.log --top-k 25 --max-workers 4
+"""
+import argparse
+import json
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import coloredlogs
+from decouple import config
+import query_runners_cached
+from query_runners_cached import QUERY_RUNNER_LOG_MARKER, get_arrow_frame_store
+logger = logging.getLogger(__name__)
+coloredlogs.install(level=config('LOG_LEVEL', default='INFO'))
+
+
+def read_query_runner_calls(log_files):
+    # yields the logged parameter sets as canonical json strings (so identical calls count together)
+    for log_file in log_files:
+        with open(log_file, 'r', errors='replace') as f:
+            for line in f:
+                if QUERY_RUNNER_LOG_MARKER not in line:
+                    continue
+                try:
+                    call = json.loads(line.split(QUERY_RUNNER_LOG_MARKER, 1)[1])
+                except json.JSONDecodeError:
+                    continue
+                yield json.dumps(call, sort_keys=True)
+
+
+def warm_query_runner_call(call: dict):
+    today = datetime.today().date()
+    runner = getattr(query_runners_cached, call['runner'])
+    parameters = {
+        name: tuple(value) if isinstance(value, list) else value
+        for name, value in call['parameters'].items()
+    }
+    # the unlogged runner, warming shouldn't count towards tomorrow's popularity
+    runner.__wrapped__(
+        start_date=today - timedelta(days=call['start_days_ago']),
+        end_date=today - timedelta(days=call['end_days_ago']),
+        filters_dict=call['filters_dict'],
+        **parameters
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log_files', nargs='+', help='dashboard log files to read the query runner calls from')
+    parser.add_argument('--top-k', type=int, default=20, help='most frequent parameter sets to warm')
+    parser.add_argument('--max-workers', type=int, default=4, help='queries to run at once')
+    parser.add_argument('--clear-cache', action='store_true', help='clear the cache first (ie. to reclaim the old builds\' space now)')
+    args = parser.parse_args()
+
+    store = get_arrow_frame_store()
+    if store is None:
+        raise ValueError('ARROW_STORE_DIR has to be set, warming a cache only this process can see does nothing')
+    if args.clear_cache:
+        store.evict(0)
+
+    call_counts = Counter(read_query_runner_calls(args.log_files))
+    top_calls = call_counts.most_common(args.top_k)
+    logger.info(f'warming {len(top_calls)} of {len(call_counts)} distinct query runner calls')
+
+    count_failed = 0
+    with ThreadPoolExecutor(max_workers=args.max_workers) as executor:
+        futures = {
+            executor.submit(warm_query_runner_call, json.loads(call)): (call, count)
+            for call, count in top_calls
+        }
+        for future in as_completed(futures):
+            call, count = futures[future]
+            try:
+                future.result()
+                logger.info(f'warmed ({count} calls): {call}')
+            except Exception:
+                count_failed += 1
+                logger.exception(f'failed to warm ({count} calls): {call}')
+    if count_failed > 0:
+        raise SystemExit(f'{count_failed} of {len(top_calls)} query runner calls failed to warm')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,28 @@
+import os
 import streamlit as st
-from decouple import config
+from decouple import config, Csv
 import coloredlogs, logging
-import snowflake.connector
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 from query_runners import (
     get_parameter_options,
-    get_retention_metric,
-    get_trial_activation_metrics_by_group,
     get_customer_success_metrics_by_group,
     get_acquisition_metrics_by_group,
-    get_user_metrics_by_group,
     get_active_customer_rate_metrics
 )
+from query_runners_cached import (
+    get_retention_metric,
+    get_user_metrics_by_group,
+    get_trial_activation_metrics_by_group,
+    get_trial_activation_metrics_by_grouping_sets,
+    get_metrics_by_group
+)
 from utils.helpers import convert_df, login
+from utils.rolling_windows import ROLLING_WINDOWS, DAYS_BACK_BY_ROLLING_WINDOW, select_rolling_window
+from utils.grouping_sets import VAR_TO_GROUP_BY_OPTIONS, DEFAULT_GROUPING_SETS_VARS_TO_GROUP_BY, slice_grouping_set
+from utils.confidence_intervals import add_wilson_interval, get_change_interval
+from utils.metric_registry import METRIC_REGISTRY
 from datetime import datetime, timedelta
 logger = logging.getLogger(__name__)
 coloredlogs.install(level=config('LOG_LEVEL'))
@@ -30,58 +39,85 @@ st.title("👾 Metric Vizer")
 
 # --------------helpers
 
-ctx = snowflake.connector.connect(
-    user=config('DB_USER'),
-    password=config('DB_PASSWORD'),
-    account=config('DB_ACCOUNT'),
-    client_session_keep_alive=True
-)
+def add_rate_interval(metric_df, metric_col, denominator_col=None, numerator_col=None):
+    # 95% wilson interval (metric_col + ' Lower' / ' Upper'), skipped when the query doesn't return the counts
+    if (denominator_col or numerator_col) not in metric_df.columns:
+        return metric_df
+    return add_wilson_interval(
+        metric_df,
+        metric_col,
+        metric_col + ' Lower',
+        metric_col + ' Upper',
+        denominator_col=denominator_col,
+        numerator_col=numerator_col
+    )
 
-def get_filter_query_from_filter_dict(filters_dict, prefix='du'):
-    if len(filters_dict) == 0:
-        return 'and true'
-    else:
-        filter_query = ''
-        for filter_name in filters_dict:
-            filter_query += 'and '
-            filter_query += 'true \n' if 'Select All' in filters_dict[filter_name] else f"{prefix}.{filter_name} in " + list_to_str_for_sql(filters_dict[filter_name]) + '\n'
-        return filter_query
-
-def get_results_from_query(filename:str, parameters:dict, logger) -> pd.DataFrame:
-    with open(filename, 'r') as f:
-        query = f.read()
-        query = query.format(**parameters)
-        logger.info(f'{filename} query: \n{query}')
-    df = pd.read_sql(query, ctx)
-    df.columns = [
-        col.lower()
-        for col in df.columns
-    ]
-    return df
+def get_registry_metric_df(start_date, end_date, total_metrics_by_last_n_days, var_to_group_by, metric, filters_dict):
+    # every window comes back in one frame, toggling windows / ranges only fetches the dates the range cache is missing
+    return select_rolling_window(
+        get_metrics_by_group(
+            start_date=start_date,
+            end_date=end_date,
+            var_to_group_by=var_to_group_by,
+            metric_names=(metric,),
+            filters_dict=filters_dict
+        ),
+        total_metrics_by_last_n_days
+    )
 
+def add_interval_bands(p, metric_df, var_to_group_by_col, lower_col, upper_col):
+    # one shaded band per line, in the line's legend group so hiding a group hides its band too
+    interval_df = metric_df.dropna(subset=[lower_col, upper_col]).sort_values('Date')
+    group_dfs = dict(list(interval_df.groupby(interval_df[var_to_group_by_col].astype(str), observed=True)))
+    for trace in list(p.data):
+        if trace.name not in group_dfs:
+            continue
+        group_df = group_dfs[trace.name]
+        p.add_trace(go.Scatter(
+            x=pd.concat([group_df['Date'], group_df['Date'][::-1]]),
+            y=pd.concat([group_df[upper_col], group_df[lower_col][::-1]]),
+            fill='toself',
+            fillcolor=trace.line.color,
+            opacity=0.15,
+            line=dict(width=0),
+            hoverinfo='skip',
+            showlegend=False,
+            legendgroup=trace.legendgroup
+        ))
 
 @st.cache_data()
-def get_trial_activation_metrics_by_group(
-    start_date,
-    end_date,
-    total_metrics_by_last_n_days,
-    var_to_group_by,
-    filters_dict={}
-):
-    filter_query = get_filter_query_from_filter_dict(filters_dict)
-    parameters = dict(
-        DB_NAME=config('DB_NAME'),
-        DB_SCHEMA=config('DB_SCHEMA'),
-        start_date=start_date, 
-        end_date=end_date, 
-        var_to_group_by=var_to_group_by,
-        total_metrics_by_last_n_days=total_metrics_by_last_n_days,
-        filters=filter_query,
-    )
-    return get_results_from_query(
-        './sql/status/metric_vizer/get_trial_activation_metrics_by_group.sql',
-        parameters, logger
-    )
+def read_anomalies(path, modified_at):
+    # modified_at keys the cache, so a new detect_anomalies.py run shows up without a restart
+    return pd.read_parquet(path)
+
+def show_anomalies(path):
+    if not os.path.exists(path):
+        return
+    anomalies_df = read_anomalies(path, os.path.getmtime(path))
+    if len(anomalies_df) == 0:
+        return
+    with st.expander(f'🚨 Anomalies ({len(anomalies_df)})', expanded=True):
+        viz_df = anomalies_df.copy()
+        viz_df['metric'] = viz_df['metric'].map(lambda metric: metric.replace('_', ' ').title())
+        viz_df['group_by'] = viz_df['group_by'].map(lambda var: var.replace('_', ' ').title())
+        st.dataframe(
+            viz_df[['metric', 'group_by', 'group_value', 'date', 'value', 'baseline', 'z_score']],
+            column_config={
+                'metric': 'Metric',
+                'group_by': 'Group By',
+                'group_value': 'Group',
+                'date': st.column_config.DateColumn('Date'),
+                'value': st.column_config.NumberColumn('Value', format='%.3f'),
+                'baseline': st.column_config.NumberColumn('Baseline', format='%.3f'),
+                'z_score': st.column_config.NumberColumn('Z-Score', format='%.1f'),
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+        st.caption(
+            f'Latest {anomalies_df["rolling_window"].iloc[0]}d rolling window values vs their trailing baseline, ' +
+            f'as of `{anomalies_df["detected_at"].max():%Y-%m-%d %H:%M}`. Pick the metric / group by above to dig in.'
+        )
 
 def plot_rate_metric(
         total_metrics_by_last_n_days, 
@@ -91,6 +127,11 @@ def plot_rate_metric(
         hover_data=[], 
         decimals=1
     ):
+    # error bands / bars when add_rate_interval found the counts
+    lower_col, upper_col = metric_col + ' Lower', metric_col + ' Upper'
+    has_interval = lower_col in metric_df.columns and upper_col in metric_df.columns
+    if has_interval:
+        hover_data = hover_data + [lower_col, upper_col]
     col1, col2 = st.columns(2)
     with col1:
         p = px.line(
@@ -101,6 +142,8 @@ def plot_rate_metric(
                 title=f'{metric_col} by {var_to_group_by_col} ({total_metrics_by_last_n_days}d rolling window)',
                 hover_data=hover_data
             )
+        if has_interval:
+            add_interval_bands(p, metric_df, var_to_group_by_col, lower_col, upper_col)
         p.update_layout(yaxis_tickformat=f'.{decimals}%')
         st.plotly_chart(p, use_container_width=True)
     with col2:
@@ -111,6 +154,11 @@ def plot_rate_metric(
                 str(round(100 * number, decimals)) + '%' for number in
                 bar_metric_df[metric_col]
             ]
+        error_x = {}
+        if has_interval:
+            bar_metric_df['error_plus'] = bar_metric_df[upper_col] - bar_metric_df[metric_col]
+            bar_metric_df['error_minus'] = bar_metric_df[metric_col] - bar_metric_df[lower_col]
+            error_x = dict(error_x='error_plus', error_x_minus='error_minus')
         p = px.bar(
                 bar_metric_df,
                 y=var_to_group_by_col,
@@ -119,6 +167,7 @@ def plot_rate_metric(
                 title=f'{metric_col} by {var_to_group_by_col} (last {total_metrics_by_last_n_days}d)',
                 text=metric_col + '_str',
                 hover_data=hover_data,
+                **error_x
             )
         p.update_layout(xaxis_tickformat=f'.{decimals}%')
         st.plotly_chart(p, use_container_width=True)
@@ -349,25 +398,31 @@ METRIC_OPTIONS = (
     METRIC_OPTIONS_CLEAN_TO_RAW_MAPPER
 ) = create_variable_mapper_and_inverse_mapper(METRIC_OPTIONS)
 
-VAR_TO_GROUP_BY_OPTIONS = [
-    'all_users',
-    'niche',
-    'attribution',
-    'total_gmv_in_first_30d_binned',
-    'count_unique_store_visits_in_first_30d_binned',
-    'ideal_user_status',
-    'stan_goal_multiple_choice',
-    'country',
-    ...
-]
+# metrics the planner can fetch together (one scan per source table) for the comparison view
+(
+    REGISTRY_METRIC_RAW_TO_CLEAN_MAPPER,
+    REGISTRY_METRIC_CLEAN_TO_RAW_MAPPER
+) = create_variable_mapper_and_inverse_mapper(list(METRIC_REGISTRY))
 
 (
     VAR_TO_GROUP_BY_OPTIONS_RAW_TO_CLEAN_MAPPER,
     VAR_TO_GROUP_BY_OPTIONS_CLEAN_TO_RAW_MAPPER
 ) = create_variable_mapper_and_inverse_mapper(VAR_TO_GROUP_BY_OPTIONS)
 
+# group bys fetched together in one scan, so flipping between them doesn't re-query
+GROUPING_SETS_VARS_TO_GROUP_BY = tuple(config(
+    'GROUPING_SETS_VARS_TO_GROUP_BY',
+    default=','.join(DEFAULT_GROUPING_SETS_VARS_TO_GROUP_BY),
+    cast=Csv()
+))
+
+# written by detect_anomalies.py
+ANOMALY_TABLE_PATH = config('ANOMALY_TABLE_PATH', default='anomalies.parquet')
+
 if login():
 
+    show_anomalies(ANOMALY_TABLE_PATH)
+
     col1, col2 = st.columns(2)
     with col1:
         metric_col = st.selectbox(
@@ -384,13 +439,10 @@ if login():
 
     # --------------parameters
     total_metrics_by_last_n_days = st.sidebar.selectbox(
-        'Rolling Window (Last N Days)', options=[30,7,1], help='30 => metrics will be aggregated based on the last 30 days before a given date. 30 is more stable but slower to react than 7 days.'
+        'Rolling Window (Last N Days)', options=ROLLING_WINDOWS, help='30 => metrics will be aggregated based on the last 30 days before a given date. 30 is more stable but slower to react than 7 days.'
     )
 
-    if total_metrics_by_last_n_days == 30:
-        day_diff_back = 361 #+ 90
-    elif total_metrics_by_last_n_days == 7:
-        day_diff_back = 91
+    day_diff_back = DAYS_BACK_BY_ROLLING_WINDOW[total_metrics_by_last_n_days]
 
     start_date = st.sidebar.date_input(
         'Start Date', 
@@ -431,21 +483,38 @@ if login():
     if metric.startswith('retention'):
         metric_n_days = int(metric.split('_')[-1].strip('d'))
         count_customers_retained_col = f'Count Customers Retained {metric_n_days}d'
-        metric_df = get_retention_metric(
-            start_date=start_date,
-            end_date=end_date,
-            total_metrics_by_last_n_days=total_metrics_by_last_n_days,
-            var_to_group_by=var_to_group_by,
-            metric_n_days=metric_n_days,
-            filters_dict=filters_dict
-        ).rename (
-            columns={
-                'date': 'Date',
-                metric: metric_col,
-                var_to_group_by: var_to_group_by_col,
-                f'count_retained_customers_for_{metric_n_days}d_last_n_days_totals': count_customers_retained_col
-            }
-        )
+        count_customers_col = f'Count Customers {metric_n_days}d'
+        if metric in METRIC_REGISTRY:
+            metric_df = get_registry_metric_df(
+                start_date, end_date, total_metrics_by_last_n_days, var_to_group_by, metric, filters_dict
+            ).rename (
+                columns={
+                    'date': 'Date',
+                    metric: metric_col,
+                    var_to_group_by: var_to_group_by_col,
+                    f'{metric}_numerator_last_n_days_totals': count_customers_retained_col,
+                    f'{metric}_denominator_last_n_days_totals': count_customers_col
+                }
+            )
+            metric_df = add_rate_interval(metric_df, metric_col, denominator_col=count_customers_col)
+        else:
+            metric_df = get_retention_metric(
+                start_date=start_date,
+                end_date=end_date,
+                total_metrics_by_last_n_days=total_metrics_by_last_n_days,
+                var_to_group_by=var_to_group_by,
+                metric_n_days=metric_n_days,
+                filters_dict=filters_dict
+            ).rename (
+                columns={
+                    'date': 'Date',
+                    metric: metric_col,
+                    var_to_group_by: var_to_group_by_col,
+                    f'count_retained_customers_for_{metric_n_days}d_last_n_days_totals': count_customers_retained_col
+                }
+            )
+            # the retention query only returns the retained count, the cohort size is backed out of the rate
+            metric_df = add_rate_interval(metric_df, metric_col, numerator_col=count_customers_retained_col)
 
         plot_rate_metric(
             total_metrics_by_last_n_days, 
@@ -460,20 +529,36 @@ if login():
         show_raw_data(total_metrics_by_last_n_days, var_to_group_by_col, metric_col, metric_df)
     
     elif metric.startswith('trial_to'):
-        metric_df = get_trial_activation_metrics_by_group(
-            start_date=start_date,
-            end_date=end_date,
-            total_metrics_by_last_n_days=total_metrics_by_last_n_days,
-            var_to_group_by=var_to_group_by, 
-            filters_dict=filters_dict
-        ).rename (
+        first_n_days = int(metric.split('_')[-1].strip('d'))
+        count_trials_col = 'Count Trials' if first_n_days == 14 else f'Count Trials In First {first_n_days}d'
+        # every window comes back in one frame, toggling windows / ranges only fetches the dates the range cache is missing
+        if var_to_group_by in GROUPING_SETS_VARS_TO_GROUP_BY:
+            metric_df = slice_grouping_set(
+                get_trial_activation_metrics_by_grouping_sets(
+                    start_date=start_date,
+                    end_date=end_date,
+                    vars_to_group_by=GROUPING_SETS_VARS_TO_GROUP_BY,
+                    filters_dict=filters_dict
+                ),
+                var_to_group_by
+            )
+        else:
+            metric_df = get_trial_activation_metrics_by_group(
+                start_date=start_date,
+                end_date=end_date,
+                var_to_group_by=var_to_group_by, 
+                filters_dict=filters_dict
+            )
+        metric_df = select_rolling_window(metric_df, total_metrics_by_last_n_days).rename (
             columns={
                 'date': 'Date',
                 metric: metric_col,
                 var_to_group_by: var_to_group_by_col,
                 'count_trials_in_first_14d_last_n_days_totals': 'Count Trials',
+                f'count_trials_in_first_{first_n_days}d_last_n_days_totals': count_trials_col,
             }
         )
+        metric_df = add_rate_interval(metric_df, metric_col, denominator_col=count_trials_col)
 
         plot_rate_metric(
             total_metrics_by_last_n_days, 
@@ -500,8 +585,8 @@ if login():
                     end_date_default - timedelta(days=30),
                     help='Date to start calculating change from'
                 )
-            end_metric_df = metric_df[metric_df['Date'] == end_date_change]
-            start_metric_df = metric_df[metric_df['Date'] == start_date_change]
+            end_metric_df = metric_df[metric_df['Date'] == pd.Timestamp(end_date_change)]
+            start_metric_df = metric_df[metric_df['Date'] == pd.Timestamp(start_date_change)]
             change_df = end_metric_df.merge(
                 start_metric_df,
                 on=var_to_group_by_col,
@@ -535,6 +620,26 @@ if login():
             total_metric_change = total_metric_end - total_metric_start
             total_metric_relative_change = total_metric_change / total_metric_start
 
+            # 95% delta method intervals, so small groups' swings aren't mistaken for real changes
+            interval_cols = []
+            if count_trials_col in metric_df.columns:
+                change_interval = get_change_interval(
+                    change_df[metric_col + '_start'],
+                    change_df[count_trials_col + '_start'],
+                    change_df[metric_col + '_end'],
+                    change_df[count_trials_col + '_end']
+                )
+                change_df['absolute_change_lower'] = 100 * change_interval['absolute_change_lower']
+                change_df['absolute_change_upper'] = 100 * change_interval['absolute_change_upper']
+                change_df['is_significant'] = change_interval['is_significant']
+                interval_cols = ['absolute_change_lower', 'absolute_change_upper', 'is_significant']
+                total_change_interval = get_change_interval(
+                    total_metric_start,
+                    change_df[count_trials_col + '_start'].sum(),
+                    total_metric_end,
+                    change_df[count_trials_col + '_end'].sum()
+                )
+
             col1, col2, col3, col4 = st.columns(4)
             with col1:
                 st.metric(
@@ -556,12 +661,19 @@ if login():
                     label='Absolute Change',
                     value='{:,}%'.format((total_metric_change*100).round(1))
                 )
+            if interval_cols:
+                st.caption(
+                    f'95% interval of the relative change: `{100 * total_change_interval["relative_change_lower"]:.1f}%` to `{100 * total_change_interval["relative_change_upper"]:.1f}%`, ' +
+                    f'of the absolute change: `{100 * total_change_interval["absolute_change_lower"]:.1f}%` to `{100 * total_change_interval["absolute_change_upper"]:.1f}%`' +
+                    (' (significant)' if total_change_interval['is_significant'] else ' (not significant)')
+                )
 
             viz_df = change_df[[
                 var_to_group_by_col,
                 'pct_of_weighted_absolute_change',
                 'relative_change',
                 'absolute_change',
+                *interval_cols,
                 'weight_100',
                 metric_col + '_start',
                 metric_col + '_end',
@@ -572,7 +684,8 @@ if login():
             viz_df[metric_col + '_start'] = 100 * viz_df[metric_col + '_start']
             viz_df[metric_col + '_end'] = 100 * viz_df[metric_col + '_end']
             for col in viz_df.columns:
-                viz_df[col] = viz_df[col].astype(float)
+                if col != 'is_significant':
+                    viz_df[col] = viz_df[col].astype(float)
             st.dataframe(
                 viz_df, 
                 column_config={
@@ -598,6 +711,18 @@ if login():
                         "Relative Change",
                         format="%.1f%%"
                     ),
+                    'absolute_change_lower': st.column_config.NumberColumn(
+                        "Absolute Change (95% Lower)",
+                        format="%.1f%%"
+                    ),
+                    'absolute_change_upper': st.column_config.NumberColumn(
+                        "Absolute Change (95% Upper)",
+                        format="%.1f%%"
+                    ),
+                    'is_significant': st.column_config.CheckboxColumn(
+                        "Significant",
+                        help='The 95% interval of the absolute change excludes 0'
+                    ),
                     metric_col + '_start': st.column_config.ProgressColumn(
                         f'Start {metric_col}',
                         format="%.0f%%",
@@ -633,21 +758,34 @@ if login():
 
     elif metric.startswith('customer_to'):
         first_n_days = int(metric.split('_')[-1].strip('d'))
-        metric_df = get_customer_success_metrics_by_group(
-            start_date=start_date,
-            end_date=end_date,
-            total_metrics_by_last_n_days=total_metrics_by_last_n_days,
-            var_to_group_by=var_to_group_by, 
-            first_n_days=first_n_days,
-            filters_dict=filters_dict
-        ).rename (
-            columns={
-                'date': 'Date',
-                metric: metric_col,
-                var_to_group_by: var_to_group_by_col,
-                'count_customers_in_first_n_days_last_n_days_totals': 'Count Customers',
-            }
-        )
+        if metric in METRIC_REGISTRY:
+            metric_df = get_registry_metric_df(
+                start_date, end_date, total_metrics_by_last_n_days, var_to_group_by, metric, filters_dict
+            ).rename (
+                columns={
+                    'date': 'Date',
+                    metric: metric_col,
+                    var_to_group_by: var_to_group_by_col,
+                    f'{metric}_denominator_last_n_days_totals': 'Count Customers',
+                }
+            )
+        else:
+            metric_df = get_customer_success_metrics_by_group(
+                start_date=start_date,
+                end_date=end_date,
+                total_metrics_by_last_n_days=total_metrics_by_last_n_days,
+                var_to_group_by=var_to_group_by, 
+                first_n_days=first_n_days,
+                filters_dict=filters_dict
+            ).rename (
+                columns={
+                    'date': 'Date',
+                    metric: metric_col,
+                    var_to_group_by: var_to_group_by_col,
+                    'count_customers_in_first_n_days_last_n_days_totals': 'Count Customers',
+                }
+            )
+        metric_df = add_rate_interval(metric_df, metric_col, denominator_col='Count Customers')
 
         plot_rate_metric(
             total_metrics_by_last_n_days, 
@@ -669,13 +807,19 @@ if login():
         )
 
     elif metric.startswith('new_'):
-        metric_df = get_acquisition_metrics_by_group(
-            start_date=start_date,
-            end_date=end_date,
-            total_metrics_by_last_n_days=total_metrics_by_last_n_days,
-            var_to_group_by=var_to_group_by, 
-            filters_dict=filters_dict
-        ).rename (
+        if metric in METRIC_REGISTRY:
+            metric_df = get_registry_metric_df(
+                start_date, end_date, total_metrics_by_last_n_days, var_to_group_by, metric, filters_dict
+            ).drop(columns=[f'{metric}_numerator_last_n_days_totals'])
+        else:
+            metric_df = get_acquisition_metrics_by_group(
+                start_date=start_date,
+                end_date=end_date,
+                total_metrics_by_last_n_days=total_metrics_by_last_n_days,
+                var_to_group_by=var_to_group_by, 
+                filters_dict=filters_dict
+            )
+        metric_df = metric_df.rename (
             columns={
                 'date': 'Date',
                 metric: metric_col,
@@ -705,8 +849,8 @@ if login():
                     end_date_default - timedelta(days=30),
                     help='Date to start calculating change from'
                 )
-            end_metric_df = metric_df[metric_df['Date'] == end_date_change]
-            start_metric_df = metric_df[metric_df['Date'] == start_date_change]
+            end_metric_df = metric_df[metric_df['Date'] == pd.Timestamp(end_date_change)]
+            start_metric_df = metric_df[metric_df['Date'] == pd.Timestamp(start_date_change)]
             change_df = end_metric_df.merge(
                 start_metric_df,
                 on=var_to_group_by_col,
@@ -981,4 +1125,51 @@ if login():
         )
         
     else:
-        raise NotImplementedError(f"metric {metric} not implemented yet")
\ No newline at end of file
+        raise NotImplementedError(f"metric {metric} not implemented yet")
+
+    with st.expander('🔀 Compare Metrics', expanded=False):
+        compare_metric_cols = st.multiselect(
+            'Metrics to Compare',
+            options=REGISTRY_METRIC_RAW_TO_CLEAN_MAPPER.values(),
+            default=[],
+            help='Metrics from the same table are fetched in one query'
+        )
+        compare_metrics = [REGISTRY_METRIC_CLEAN_TO_RAW_MAPPER[col] for col in compare_metric_cols]
+        if len(compare_metrics) > 0:
+            compare_df = get_metrics_by_group(
+                start_date=start_date,
+                end_date=end_date,
+                var_to_group_by=var_to_group_by,
+                metric_names=tuple(compare_metrics),
+                filters_dict=filters_dict
+            )
+            compare_df = select_rolling_window(compare_df, total_metrics_by_last_n_days)
+            for compare_metric, compare_metric_col in zip(compare_metrics, compare_metric_cols):
+                count_col = f'Count {compare_metric_col}'
+                compare_metric_df = compare_df.rename(
+                    columns={
+                        'date': 'Date',
+                        compare_metric: compare_metric_col,
+                        var_to_group_by: var_to_group_by_col,
+                        f'{compare_metric}_denominator_last_n_days_totals': count_col,
+                    }
+                )
+                if METRIC_REGISTRY[compare_metric].aggregation == 'rate':
+                    compare_metric_df = add_rate_interval(compare_metric_df, compare_metric_col, denominator_col=count_col)
+                    plot_rate_metric(
+                        total_metrics_by_last_n_days,
+                        var_to_group_by_col,
+                        compare_metric_col,
+                        compare_metric_df,
+                        hover_data=[
+                                count_col
+                        ]
+                    )
+                else:
+                    plot_totals_metric(
+                        total_metrics_by_last_n_days,
+                        var_to_group_by_col,
+                        compare_metric_col,
+                        compare_metric_df,
+                        order_legend_by=order_legend_by
+                    )
@@ -0,0 +1,64 @@
+{{
+    config(
+        materialized='table',
+        cluster_by=['first_trial_at']
+    )
+}}
+
+{#-
+    every activation x time cap in one pass over the users, one row per user.
+    add an activation or a time cap through the `activation_time_caps` var, not a new model:
+        activation name: start event, converted event, time caps (days)
+-#}
+{% set activations = var('activation_time_caps', {
+    'trial_to_customer': {
+        'start_at': 'du.first_trial_at',
+        'converted_at': 'du.first_customer_at',
+        'time_caps': [1, 14, 30]
+    },
+    'trial_to_live': {
+        'start_at': 'du.first_trial_at',
+        'converted_at': 'ua.first_live_at',
+        'time_caps': [1, 14, 30]
+    },
+    'customer_to_at_least_100_gmv': {
+        'start_at': 'du.first_customer_at',
+        'converted_at': 'ua.first_at_least_100_gmv_at',
+        'time_caps': [30, 60, 180]
+    },
+}) %}
+
+with users as (
+    select
+        du.user_id
+        ,date(du.first_trial_at) as first_trial_at
+        ,date(du.first_customer_at) as first_customer_at
+        {% for activation, activation_config in activations.items() %}
+        ------------------------ {{ activation }}
+        ,datediff('day', {{ activation_config['start_at'] }}, current_date()) as days_since_{{ activation }}_start
+        ,datediff('day', {{ activation_config['start_at'] }}, {{ activation_config['converted_at'] }}) as days_to_{{ activation }}
+        {% endfor %}
+    from {{ ref('dim_users') }} as du
+    left join {{ ref('fct_accumulating_users') }} as ua on du.user_id = ua.user_id
+    where true
+        and (du.first_trial_at is not null or du.first_customer_at is not null)
+)
+
+select
+    user_id
+    ,first_trial_at
+    ,first_customer_at
+    {% for activation, activation_config in activations.items() %}
+    ,days_to_{{ activation }}
+    {% for time_cap in activation_config['time_caps'] %}
+    -- see which users started at least {{ time_cap }} days ago (the denominator)
+    ,coalesce(days_since_{{ activation }}_start > {{ time_cap }}, false) as is_{{ activation }}_eligible_{{ time_cap }}d
+    -- see which of them converted within {{ time_cap }} days (the numerator)
+    ,coalesce(
+        days_since_{{ activation }}_start > {{ time_cap }}
+        and days_to_{{ activation }} <= {{ time_cap }},
+        false
+    ) as is_{{ activation }}_in_first_{{ time_cap }}d
+    {% endfor %}
+    {% endfor %}
+from users
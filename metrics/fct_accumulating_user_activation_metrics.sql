@@ -1,4 +1,9 @@
-
+{{
+    config(
+        materialized='table',
+        cluster_by=['first_trial_at']
+    )
+}}
 
 with 
 
@@ -1,3 +1,10 @@
+{{
+    config(
+        materialized='table',
+        cluster_by=['first_customer_at']
+    )
+}}
+
 with totals as (
     {% set periods = range(30, 900, 30) %}
     select 